@@ -78,9 +78,81 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # seconds a connection is kept open for the next requests of its thread
+        'CONN_MAX_AGE': 60,
+        # tests run on a database file as well, so that connections of
+        # threads lock each other as they do on the site
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Run on every new SQLite connection (compiler.sqlite). WAL lets pages be read
+# while another connection writes and, with synchronous=NORMAL, commits without
+# waiting for the disk; busy_timeout (milliseconds) makes a writer wait for the
+# lock instead of failing with "database is locked"; cache_size is in KiB when
+# negative.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20 * 1000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is per process; switch to FileBasedCache (or a shared backend)
+# when running several workers, so folder tree invalidation reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+FOLDER_TREE_CACHE_TIMEOUT = 60 * 60
+
+# Text of files, stored once per distinct source and zlib-compressed at this
+# level when that makes it smaller (0 stores it as it is)
+SOURCE_BLOB_COMPRESS_LEVEL = 6
+
+# Parsed sections, shared by files with the same source
+PARSE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Compilation results, keyed by source hash and sdcc options
+COMPILE_CACHE_DIR = BASE_DIR / 'asm_cache'
+COMPILE_CACHE_MAX_SIZE = 100 * 1024 * 1024
+# Seconds results of sdcc that could not be started are kept, outside of
+# COMPILE_CACHE_MAX_SIZE, for the page or job that shows them
+COMPILE_CACHE_FAILED_TIMEOUT = 10 * 60
+
+# Every compilation runs sdcc in a directory of its own inside
+# COMPILE_SANDBOX_DIR. Directories older than COMPILE_SANDBOX_MAX_AGE (seconds)
+# are removed by the reaper, which runs in the background at most once per
+# COMPILE_REAPER_INTERVAL
+COMPILE_SANDBOX_DIR = BASE_DIR / 'asm'
+COMPILE_SANDBOX_MAX_AGE = 60 * 60
+COMPILE_REAPER_INTERVAL = 10 * 60
+
+# Compile job queue, kept in the database. Jobs are run by
+# "manage.py compile_worker", a service of its own next to the web processes,
+# which starts COMPILE_QUEUE_PROCESSES worker processes by default so that
+# they bound the compilers running at once for the whole site.
+# For development without a worker, COMPILE_QUEUE_WORKERS > 0 runs jobs in
+# that many threads of each web process instead; every job still runs sdcc
+# in a process of its own and the thread only waits for it.
+COMPILE_QUEUE_WORKERS = 0
+COMPILE_QUEUE_PROCESSES = 4
+COMPILE_QUEUE_MAX_QUEUED = 100
+COMPILE_QUEUE_POLL_INTERVAL = 0.25
+# A job running for longer than COMPILE_QUEUE_JOB_TIMEOUT seconds was left by a
+# process that died; it is queued again until it was started
+# COMPILE_QUEUE_MAX_ATTEMPTS times, and failed after that
+COMPILE_QUEUE_JOB_TIMEOUT = 5 * 60
+COMPILE_QUEUE_MAX_ATTEMPTS = 2
+COMPILE_QUEUE_MAX_WAIT = 20
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
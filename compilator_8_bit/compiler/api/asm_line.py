@@ -0,0 +1,19 @@
+class AsmLine:
+
+    __slots__ = ("code", "start", "start_class", "position", "source_code_line")
+
+    # start_class and position are set on the separator lines that open
+    # ("before") or close ("after") a header block of the listing
+    def __init__(self, code, source_code_line=0, start_class="", position=""):
+        self.code = code
+        self.start = start_class != ""
+        self.start_class = start_class
+        self.position = position
+        self.source_code_line = source_code_line
+
+    # the dict the listing used to be made of, e.g. for JSON responses
+    def as_dict(self):
+        if self.start:
+            return {"code": self.code, "start": True, "start_class": self.start_class,
+                    "position": self.position, "source_code_line": self.source_code_line}
+        return {"code": self.code, "start": False, "source_code_line": self.source_code_line}
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from pathlib import Path
+from django.conf import settings
+from .compile_result import CompileResult
+
+ASM_FILE = "source.asm"
+STDERR_FILE = "source.stderr"
+STATUS_FILE = "status.json"
+INDEX_FILE = "index.json"
+# entries of put_failed, apart from the ones keyed by source and options
+FAILED_DIR = ".failed"
+
+
+class CompileCache:
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = Path(directory or settings.COMPILE_CACHE_DIR)
+        self.max_size = max_size if max_size is not None else settings.COMPILE_CACHE_MAX_SIZE
+
+    @staticmethod
+    def get_key(source_hash, options):
+        digest = hashlib.sha256()
+        digest.update(source_hash.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(" ".join(options).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        entry = self.__get_entry(key)
+        if entry is None:
+            return None
+        try:
+            with open(entry / STATUS_FILE) as file:
+                status = json.load(file)
+            stderr = (entry / STDERR_FILE).read_bytes()
+            asm = (entry / ASM_FILE).read_text(encoding="utf-8") if status["has_asm"] else None
+            # mtime of the entry is its last use, eviction drops the oldest
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return {
+            "result": CompileResult(status["returncode"], stderr, asm),
+            "status": status["status"],
+            "data": status["data"]
+        }
+
+    # read apart from the result, only the line index view needs it; None
+    # for entries written before it was kept
+    def get_line_index(self, key):
+        entry = self.__get_entry(key)
+        if entry is None:
+            return None
+        try:
+            with open(entry / INDEX_FILE) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    # keys also come back from the client as compilation ids
+    def __get_entry(self, key):
+        if not re.fullmatch("[0-9a-f]{32,64}", key or ""):
+            return None
+        entry = self.directory / key
+        if not entry.exists():
+            entry = self.directory / FAILED_DIR / key
+        return entry
+
+    # line_index is missing in entries written before it was kept
+    def put(self, key, result, status, data, line_index=None):
+        if self.__write(self.directory / key, result, status, data, line_index):
+            self.evict()
+
+    # results that say nothing about the source, as sdcc that could not be
+    # started, are kept under a key of their own for the page that shows
+    # them; they do not count towards max_size and are removed after
+    # COMPILE_CACHE_FAILED_TIMEOUT seconds; returns the key
+    def put_failed(self, result, status, data):
+        key = uuid.uuid4().hex
+        self.__write(self.directory / FAILED_DIR / key, result, status, data)
+        self.expire_failed()
+        return key
+
+    def expire_failed(self):
+        expired = time.time() - settings.COMPILE_CACHE_FAILED_TIMEOUT
+        try:
+            entries = list(os.scandir(self.directory / FAILED_DIR))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < expired:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                # removed meanwhile by another worker
+                continue
+
+    # returns whether the entry was written, it is never replaced
+    def __write(self, entry, result, status, data, line_index=None):
+        if entry.exists():
+            return False
+
+        # entry is written aside and renamed, so readers never see half of it
+        tmp = self.directory / (".tmp-" + uuid.uuid4().hex)
+        tmp.mkdir(parents=True)
+        try:
+            if result.asm is not None:
+                (tmp / ASM_FILE).write_text(result.asm, encoding="utf-8")
+            (tmp / STDERR_FILE).write_bytes(result.stderr)
+            if line_index is not None:
+                with open(tmp / INDEX_FILE, "w") as file:
+                    json.dump(line_index, file)
+            with open(tmp / STATUS_FILE, "w") as file:
+                json.dump({
+                    "returncode": result.returncode,
+                    "has_asm": result.asm is not None,
+                    "status": status,
+                    "data": data
+                }, file)
+            entry.parent.mkdir(exist_ok=True)
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        return True
+
+    # least recently used entries go first until the cache fits max_size
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                size = sum(file.stat().st_size for file in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, size, entry.path))
+            except OSError:
+                # removed meanwhile by another worker
+                continue
+            total += size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,138 @@
+import os
+import time
+import socket
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from compiler.models import CompileJob
+from .compiler import Compiler
+from .section import SectionApi
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class CompileQueue:
+
+    def get(self, id, user=None):
+        jobs = CompileJob.objects.all()
+        if user is not None:
+            jobs = jobs.filter(user=user)
+        return jobs.get(pk=id)
+
+    def enqueue(self, data):
+        queued = CompileJob.objects.filter(status=CompileJob.QUEUED).count()
+        if queued >= settings.COMPILE_QUEUE_MAX_QUEUED:
+            raise ValueError("Compile queue is full.")
+
+        job = CompileJob(
+            file_id = data["file_id"],
+            user = data["user"],
+            standard = data["standard"],
+            processor = data["processor"],
+            optimizations = data.get("optimizations", []),
+            dependent = data.get("dependent", [])
+        )
+        job.save()
+
+        transaction.on_commit(self.__schedule)
+        return job.id
+
+    # name of the process claiming jobs, kept on them while they run
+    @staticmethod
+    def get_worker_name(pid=None):
+        return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+    # compare-and-set on status, so a job is claimed by exactly one worker
+    def claim(self):
+        self.recover()
+        while True:
+            job = CompileJob.objects.filter(status=CompileJob.QUEUED).order_by("id").first()
+            if job is None:
+                return None
+            start_date = timezone.now()
+            worker = self.get_worker_name()
+            claimed = CompileJob.objects.filter(pk=job.pk, status=CompileJob.QUEUED) \
+                .update(status=CompileJob.RUNNING, start_date=start_date, worker=worker,
+                        attempts=F("attempts") + 1)
+            if claimed:
+                job.status = CompileJob.RUNNING
+                job.start_date = start_date
+                job.worker = worker
+                job.attempts += 1
+                return job
+
+    # jobs left running by processes that died, the given workers or any
+    # running past COMPILE_QUEUE_JOB_TIMEOUT, are queued again or failed
+    # once out of attempts; returns how many
+    def recover(self, workers=None):
+        jobs = CompileJob.objects.filter(status=CompileJob.RUNNING)
+        if workers is None:
+            jobs = jobs.filter(start_date__lt=timezone.now() - timedelta(seconds=settings.COMPILE_QUEUE_JOB_TIMEOUT))
+        else:
+            jobs = jobs.filter(worker__in=workers)
+        # read first, so that polling workers do not take the write lock
+        if not jobs.exists():
+            return 0
+        failed = jobs.filter(attempts__gte=settings.COMPILE_QUEUE_MAX_ATTEMPTS).update(status=CompileJob.FAILED)
+        queued = jobs.update(status=CompileJob.QUEUED, start_date=None, worker="")
+        return failed + queued
+
+    def run(self, job):
+        try:
+            compiler = Compiler(str(job.file_id), job.standard, job.processor,
+                                job.optimizations, job.dependent)
+            job.uid = compiler.compile()
+            status, error_lines = compiler.get_compilation_statuses()
+            section_api = SectionApi(job.file_id)
+            section_api.apply_compilation_statuses(status, error_lines)
+            job.compilation_status = status
+            job.status = CompileJob.DONE
+        except Exception:
+            job.status = CompileJob.FAILED
+        job.save()
+        return job
+
+    def run_next(self):
+        job = self.claim()
+        if job is not None:
+            self.run(job)
+        return job
+
+    def drain(self):
+        try:
+            while self.run_next() is not None:
+                pass
+        finally:
+            connection.close()
+
+    # polls until the job leaves the queue or timeout seconds pass; a job
+    # waiting for a process that is gone is handed to this one
+    def wait(self, id, user=None, timeout=0):
+        deadline = time.monotonic() + timeout
+        recovered = self.recover()
+        job = self.get(id, user)
+        if recovered or job.status == CompileJob.QUEUED:
+            transaction.on_commit(self.__schedule)
+        while job.status in (CompileJob.QUEUED, CompileJob.RUNNING) and time.monotonic() < deadline:
+            time.sleep(settings.COMPILE_QUEUE_POLL_INTERVAL)
+            job.refresh_from_db()
+        return job
+
+    def __schedule(self):
+        if settings.COMPILE_QUEUE_WORKERS > 0:
+            self.__get_executor().submit(self.drain)
+
+    # the development fallback for running without "manage.py compile_worker":
+    # jobs run in a bounded thread pool inside the web process
+    def __get_executor(self):
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.COMPILE_QUEUE_WORKERS,
+                                               thread_name_prefix="compile")
+            return _executor
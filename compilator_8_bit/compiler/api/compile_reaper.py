@@ -0,0 +1,44 @@
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+from django.conf import settings
+
+_last_run = 0
+_lock = threading.Lock()
+
+
+class CompileReaper:
+
+    def __init__(self, max_age=None, directory=None):
+        self.directory = Path(directory or settings.COMPILE_SANDBOX_DIR)
+        self.max_age = max_age if max_age is not None else settings.COMPILE_SANDBOX_MAX_AGE
+
+    # removes compilation directories left behind by interrupted compiles
+    def reap(self):
+        removed = 0
+        deadline = time.time() - self.max_age
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return removed
+        for entry in entries:
+            try:
+                if entry.is_dir() and entry.stat().st_mtime < deadline:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    # runs reap in a background thread, at most once per interval
+    def schedule(self):
+        global _last_run
+        now = time.monotonic()
+        with _lock:
+            if _last_run and now - _last_run < settings.COMPILE_REAPER_INTERVAL:
+                return False
+            _last_run = now
+        threading.Thread(target=self.reap, name="compile-reaper", daemon=True).start()
+        return True
@@ -0,0 +1,13 @@
+class CompileResult:
+
+    __slots__ = ("returncode", "stderr", "asm")
+
+    # returncode is None when sdcc could not be started, asm is None
+    # when sdcc did not produce an .asm file
+    def __init__(self, returncode, stderr, asm):
+        self.returncode = returncode
+        self.stderr = stderr
+        self.asm = asm
+
+    def get_stderr(self):
+        return self.stderr.decode("utf-8", errors="replace")
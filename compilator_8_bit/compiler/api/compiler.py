@@ -1,12 +1,22 @@
-import uuid
-import subprocess
+import os
 import re
+import shutil
+import tempfile
+import subprocess
 from pathlib import Path
-from django.core.files.storage import FileSystemStorage
-from compilator_8_bit.settings import BASE_DIR
+from django.conf import settings
 from .file import FileApi
+from .compile_cache import CompileCache
+from .compile_result import CompileResult
+from .compile_reaper import CompileReaper
+from .asm_line import AsmLine
 
-COMPILER_DIR = "asm"
+# sdcc tags the code of a source line with a ";\tsource.c: 12: ..." comment
+# and reports errors as "source.c:12: ..."; the name is Compiler.file_name
+# with Compiler.file_ext
+asm_source_line = re.compile(";\t*\\s*source.c:\\s*(\\d+)")
+error_source_line = re.compile("source.c:(\\d+)")
+asm_separator = ";-----------------"
 
 
 class Compiler:
@@ -16,18 +26,23 @@ class Compiler:
     asm_ext = ".asm"
 
     def __init__(self, *args):
+        self.statuses = None
+        self.result = None
+        self.line_index = None
+        self.asm_code = None
         if len(args) == 5:
             self.file_id = args[0]
             self.standard = args[1]
             self.processor = args[2]
             self.optimizations = args[3]
             self.dependent = args[4]
-            self.uid = str(uuid.uuid1())
+            self.uid = None
             self.can_compile = True
         else:
             self.uid = args[0]
             self.can_compile = False
 
+    # returns the id under which the result can be read back by Compiler(uid)
     def compile(self):
         if self.can_compile == False:
             raise TypeError("Initialize compiler properly!")
@@ -39,14 +54,45 @@ class Compiler:
         print(self.optimizations)
         print(self.dependent)
         print("Koniec zmiennych")
-        self.__create_directory()
-        self.__create_source_code_file()
-        self.__compile()
+        file_api = FileApi()
+        file = file_api.get(self.file_id)
+        compile_cache = CompileCache()
+        # the text is read only when it has to be compiled
+        key = compile_cache.get_key(file.source_hash, self.__get_options())
+
+        cached = compile_cache.get(key)
+        if cached:
+            self.result = cached["result"]
+            self.statuses = cached["status"], cached["data"]
+            self.uid = key
+            return self.uid
+
+        self.compile_source(file.source_code)
+        status, data = self.get_compilation_statuses()
+        # sdcc missing or not executable is not a property of the source,
+        # such a result is kept only for the page that shows it
+        if self.result.returncode is None:
+            self.uid = compile_cache.put_failed(self.result, status, data)
+        else:
+            compile_cache.put(key, self.result, status, data, self.get_line_index())
+            self.uid = key
         return self.uid
+
+    def compile_source(self, source_code):
+        CompileReaper().schedule()
+        self.__create_directory()
+        try:
+            self.__create_source_code_file(source_code)
+            self.result = self.__compile()
+        finally:
+            self.__delete_directory()
+        return self.result
     
     def get_compilation_statuses(self):
-        file_name = self.file_name + ".stderr"
-        error_body = self.__get_asm(file_name)
+        if self.statuses is not None:
+            return self.statuses
+
+        error_body = self.result.get_stderr()
         error_lines = error_body.split(self.file_name + self.file_ext + ":")[1:]
 
         data = []
@@ -58,121 +104,131 @@ class Compiler:
                     "line_content": error
                 })
         status = "Compiled without warnings"
-        if self.__check_asm_exists():
+        if self.result.asm is not None:
             if len(data):
                 status = "Compiled with warnings"
         else:
             status = "Does not compile"
-        return status, data
+        self.statuses = status, data
+        return self.statuses
     
-    def get_and_delete_asm(self):
-        try:
-            file_name = self.file_name + self.asm_ext
-            asm_body = self.__get_asm(file_name)
-            self.__delete_directory()
-            enriched = self.__enrich_asm(asm_body.split("\n"))
-            return True, enriched
-        except:
-            file_name = self.file_name + ".stderr"
-            error_body = self.__get_asm(file_name)
-            self.__delete_directory()
-            enriched = self.__enrich_error(error_body.split("\n"))
+    def get_asm(self):
+        result = self.__get_result()
+        if result.asm is not None:
+            return True, self.__get_asm_code()
+        else:
+            enriched = self.__enrich_error(result.get_stderr().split("\n"))
             return False, enriched
 
+    # asm lines made of every source line and the source line of every asm
+    # line, None when there is no asm; read from the cache when it was kept
+    # there, else built from the lines get_asm returns
+    def get_line_index(self):
+        result = self.__get_result()
+        if self.line_index is None and result.asm is not None:
+            if self.uid is not None:
+                self.line_index = CompileCache().get_line_index(self.uid)
+            if self.line_index is None:
+                self.line_index = self.__index_asm(self.__get_asm_code())
+        return self.line_index
+
+    def __get_result(self):
+        if self.result is None:
+            cached = CompileCache().get(self.uid)
+            if cached is None:
+                raise ValueError("Compilation result not found!")
+            self.result = cached["result"]
+        return self.result
+
+    # the listing is enriched once, for the line index and for the page
+    def __get_asm_code(self):
+        if self.asm_code is None:
+            self.asm_code = self.__enrich_asm(self.__get_result().asm.split("\n"))
+        return self.asm_code
+
     def __create_directory(self):
-        directory = str(Path(BASE_DIR, COMPILER_DIR))
-        command = "cd " + directory + " && mkdir " + self.uid
-        subprocess.call(command, shell=True)
+        directory = Path(settings.COMPILE_SANDBOX_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(dir=directory)
 
-    def __create_source_code_file(self):
-        file_api = FileApi()
-        source_code = file_api.get_source_code(self.file_id)
+    def __create_source_code_file(self, source_code):
         file_name = self.file_name + self.file_ext
-        file = str(Path(BASE_DIR, COMPILER_DIR, self.uid, file_name))
+        file = Path(self.directory, file_name)
         with open(file, "w+") as destination:
             destination.write(source_code)
 
+    # stderr comes from the pipe, only the .asm written by sdcc is read from disk
     def __compile(self):
-        directory = str(Path(BASE_DIR, COMPILER_DIR, self.uid))
-        file_name = self.file_name
-        options = self.__get_options()
-        command = "cd " + directory + " && sdcc -S " + options + " " + file_name + \
-            self.file_ext + " 1>" + file_name + ".stdout 2>" + file_name + ".stderr"
+        command = ["sdcc", "-S"] + self.__get_options() + [self.file_name + self.file_ext]
         print(command)
-        subprocess.call(command, shell=True)
-
-    def __get_options(self):
-        optimizations = ""
-        dependent = ""
-
-        for optimization in self.optimizations:
-            optimizations += " --" + optimization
+        try:
+            process = subprocess.run(command, cwd=self.directory,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as error:
+            return CompileResult(None, f"sdcc: {error.strerror}\n".encode(), None)
 
-        for dep in self.dependent:
-            dependent += " --" + dep
+        try:
+            asm = Path(self.directory, self.file_name + self.asm_ext).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            asm = None
+        return CompileResult(process.returncode, process.stderr, asm)
 
-        return "--std-" + self.standard + " -m" + self.processor + optimizations + dependent
-    
-    def __get_asm(self, file_name):
-        file = str(Path(BASE_DIR, COMPILER_DIR, self.uid, file_name))
-        fs = FileSystemStorage()
+    # flags are deduplicated and sorted, so equal option sets share a cache key
+    def __get_options(self):
+        optimizations = ["--" + optimization for optimization in sorted(set(self.optimizations))]
+        dependent = ["--" + dep for dep in sorted(set(self.dependent))]
 
-        file_body = fs.open(file).read().decode("utf-8")
-        return file_body
-    
-    def __check_asm_exists(self):
-        file_name = self.file_name + self.asm_ext
-        file = str(Path(BASE_DIR, COMPILER_DIR, self.uid, file_name))
-        fs = FileSystemStorage()
-        return fs.exists(file)
+        return ["--std-" + self.standard, "-m" + self.processor] + optimizations + dependent
     
     def __enrich_asm(self, lines):
-        class_header = "asm-header"
-        class_body = "asm-body"
-        file_name = self.file_name + self.file_ext
-        regex =  "^;\t*\s*" + file_name + ":\s*\d+"
-        regex_repl = ";\t*\s*" + file_name + ":\s*"
-
         is_body = True
         data = []
+        append = data.append
         for line in lines:
-            source_code_line = 0
-            if is_body == True and line.startswith(";-----------------"):
-                data.append({"code": line, "start": True, "start_class": class_header, "position": "before", "source_code_line": source_code_line})
-                is_body = False
-            elif is_body == False and line.startswith(";-----------------"):
-                data.append({"code": line, "start": True, "start_class": class_body, "position": "after", "source_code_line": source_code_line})
-                is_body = True
-            elif is_body == False and line.startswith(";"):
-                data.append({"code": line, "start": False, "source_code_line": source_code_line})
-            elif is_body == True and line.startswith(";"):
-                match = re.search(regex, line)
-                if match:
-                    source_code_line = int(re.sub(regex_repl, "", match.group(0)))
-                data.append({"code": line, "start": False, "source_code_line": source_code_line})
+            if not line.startswith(";"):
+                append(AsmLine(line))
+            elif line.startswith(asm_separator):
+                if is_body:
+                    append(AsmLine(line, 0, "asm-header", "before"))
+                else:
+                    append(AsmLine(line, 0, "asm-body", "after"))
+                is_body = not is_body
+            elif is_body:
+                match = asm_source_line.match(line)
+                append(AsmLine(line, int(match.group(1)) if match else 0))
             else:
-                data.append({"code": line, "start": False, "source_code_line": source_code_line})
+                append(AsmLine(line))
         return data
     
-    def __enrich_error(self, lines):
-        file_name = self.file_name + self.file_ext
-        regex =  "^" + file_name + ":\d+"
-        regex_repl = file_name + ":"
+    # a source line tag starts a range of asm lines that goes on until the
+    # next tag or block separator; keys are strings as they come back from JSON
+    def __index_asm(self, asm_code):
+        source_to_asm = {}
+        asm_to_source = [0] * len(asm_code)
+        ranges = None
+        source_code_line = 0
+        for number, line in enumerate(asm_code, start=1):
+            if line.start:
+                source_code_line = 0
+            elif line.source_code_line > 0:
+                source_code_line = line.source_code_line
+                ranges = source_to_asm.setdefault(str(source_code_line), [])
+                ranges.append([number, number])
+            elif source_code_line > 0:
+                ranges[-1][1] = number
+            asm_to_source[number - 1] = source_code_line
+        return {"source_to_asm": source_to_asm, "asm_to_source": asm_to_source}
 
+    def __enrich_error(self, lines):
         data = []
         for line in lines:
-            source_code_line = 0
-            match = re.search(regex, line)
-            if match:
-                source_code_line = int(re.sub(regex_repl, "", match.group(0)))
+            match = error_source_line.match(line)
             data.append({
                 "line_content": line,
-                "source_code_line": source_code_line
+                "source_code_line": int(match.group(1)) if match else 0
             })
         return data
 
     def __delete_directory(self):
-        directory = str(Path(BASE_DIR, COMPILER_DIR))
-        command = "cd " + directory + " && rm -rf " + self.uid
-        subprocess.call(command, shell=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
 
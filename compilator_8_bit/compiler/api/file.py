@@ -1,6 +1,9 @@
+from datetime import timedelta
 from django.utils import timezone
 from compiler.models import File
 from .folder import FolderApi
+from .folder_tree import FolderTreeCache
+from .source_lines import SourceLines
 
 class FileApi:
     def get(self, id):
@@ -36,10 +39,17 @@ class FileApi:
         file.enabled = False
         file.enable_update_date = timezone.now()
         file.save()
+        FolderTreeCache.bump_version()
+
+    # removes files deleted more than days ago for good, their blobs go with
+    # the last file using them
+    def purge(self, days):
+        files = File.objects.filter(enabled=False, enable_update_date__lt=timezone.now() - timedelta(days=days))
+        return files.delete()[1].get(File._meta.label, 0)
 
     def delete_section(self, id, start_line, end_line):
         file = self.get(id)
-        splitted = file.source_code.split("\n")
-        del splitted[start_line - 1 : end_line]
-        file.source_code = '\n'.join(splitted)
+        source_code, line_offsets, deleted = SourceLines(file).delete(start_line, end_line)
+        file.set_source_code(source_code, line_offsets)
         file.save()
+        return deleted
@@ -1,5 +1,6 @@
 from django.utils import timezone
 from compiler.models import Folder
+from .folder_tree import FolderTreeCache
 
 class FolderApi:
     def get(self, id):
@@ -29,3 +30,4 @@ class FolderApi:
         folder.enabled = False
         folder.enable_update_date = timezone.now()
         folder.save()
+        FolderTreeCache.bump_version()
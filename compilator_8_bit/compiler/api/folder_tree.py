@@ -1,53 +1,85 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
 from compiler.models import Folder, File
 
 
 class FolderTree:
     def __init__(self):
-        self.folders = Folder.objects.all()
-        self.files = File.objects.all()
+        self.folders = Folder.objects.filter(enabled=True).order_by("id")
+        self.files = File.objects.filter(enabled=True).order_by("id")
 
     def get_folder_structure(self):
-        roots = self.__find_roots()
-        tree = self.__traverse_siblings(roots)
-        return tree
+        nodes, roots = self.__build_folders()
+        self.__attach_files(nodes)
+        for node in nodes.values():
+            node['has_children'] = (len(node['children']) > 0)
+        return roots
 
-    def __find_roots(self):
-        roots = []
-        root_folders = self.folders.filter(
-            parent_id__isnull=True, enabled=True)
-        for elem in root_folders:
-            root = {
-                'id': elem.id,
-                'name': elem.name,
-                'is_file': False
+    # all enabled folders in one query, linked to their parents in memory;
+    # subtrees under a disabled or missing parent are never reached from roots
+    def __build_folders(self):
+        rows = list(self.folders.values("id", "name", "parent_id"))
+        nodes = {}
+        for elem in rows:
+            nodes[elem['id']] = {
+                'id': elem['id'],
+                'name': elem['name'],
+                'is_file': False,
+                'children': []
             }
-            roots.append(root)
-        return roots
 
-    def __traverse_siblings(self, siblings):
-        for elem in siblings:
-            children = []
-            child_folders = self.folders.filter(
-                parent_id=elem['id'], enabled=True)
-            for child_folder in child_folders:
-                child = {
-                    'id': child_folder.id,
-                    'name': child_folder.name,
-                    'is_file': False
-                }
-                children.append(child)
-            elem['children'] = children
-            if (len(children)):
-                self.__traverse_siblings(elem['children'])
-
-            child_files = self.files.filter(folder_id=elem['id'], enabled=True)
-            for child_file in child_files:
-                child = {
-                    'id': child_file.id,
-                    'name': child_file.name,
+        roots = []
+        for elem in rows:
+            node = nodes[elem['id']]
+            if elem['parent_id'] is None:
+                roots.append(node)
+            else:
+                parent = nodes.get(elem['parent_id'])
+                if parent is not None:
+                    parent['children'].append(node)
+        return nodes, roots
+
+    # files go after child folders, the same order the template always got
+    def __attach_files(self, nodes):
+        for elem in self.files.values("id", "name", "folder_id"):
+            parent = nodes.get(elem['folder_id'])
+            if parent is not None:
+                parent['children'].append({
+                    'id': elem['id'],
+                    'name': elem['name'],
                     'is_file': True
-                }
-                elem['children'].append(child)
+                })
+
+
+class FolderTreeCache:
+
+    version_key = "folder_tree:version"
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    def get_folder_structure(self):
+        key = f"folder_tree:{self.user_id}:{self.get_version()}"
+        tree = cache.get(key)
+        if tree is None:
+            tree = FolderTree().get_folder_structure()
+            cache.set(key, tree, settings.FOLDER_TREE_CACHE_TIMEOUT)
+        return tree
+
+    # a lost version key restarts from the clock, so entries cached under
+    # an older version can never be served again
+    @classmethod
+    def get_version(cls):
+        version = cache.get(cls.version_key)
+        if version is None:
+            cache.add(cls.version_key, time.time_ns(), None)
+            version = cache.get(cls.version_key)
+        return version
 
-            elem['has_children'] = (len(elem['children']) > 0)
-        return siblings
+    @classmethod
+    def bump_version(cls):
+        try:
+            cache.incr(cls.version_key)
+        except ValueError:
+            cache.add(cls.version_key, time.time_ns(), None)
@@ -0,0 +1,76 @@
+import re
+
+CODE = 0
+SLASH = 1
+STRING = 2
+STRING_ESCAPE = 3
+CHAR = 4
+CHAR_ESCAPE = 5
+LINE_COMMENT = 6
+BLOCK_COMMENT = 7
+BLOCK_STAR = 8
+
+# next state for a character, one row per state; characters missing from
+# a row go to the state's default
+transitions = [
+    {'"': STRING, "'": CHAR, "/": SLASH},                    # CODE
+    {'"': STRING, "'": CHAR, "/": LINE_COMMENT, "*": BLOCK_COMMENT},  # SLASH
+    {"\\": STRING_ESCAPE, '"': CODE},                        # STRING
+    {},                                                      # STRING_ESCAPE
+    {"\\": CHAR_ESCAPE, "'": CODE},                          # CHAR
+    {},                                                      # CHAR_ESCAPE
+    {},                                                      # LINE_COMMENT
+    {"*": BLOCK_STAR},                                       # BLOCK_COMMENT
+    {"*": BLOCK_STAR, "/": CODE},                            # BLOCK_STAR
+]
+defaults = [CODE, CODE, STRING, STRING, CHAR, CHAR, LINE_COMMENT, BLOCK_COMMENT, BLOCK_COMMENT]
+
+# state carried to the next line; a backslash at the end of a line splices
+# it with the next one, so escapes and line comments go on
+end_of_line = [CODE, CODE, CODE, STRING, CODE, CHAR, CODE, BLOCK_COMMENT, BLOCK_COMMENT]
+end_of_spliced_line = [CODE, CODE, CODE, STRING, CODE, CHAR, LINE_COMMENT, BLOCK_COMMENT, BLOCK_COMMENT]
+
+brackets = {"{": 0, "}": 1, "(": 2, ")": 3}
+# lines in code without these characters stay in code and only need their
+# brackets counted
+special_characters = re.compile("[\"'/\\\\]")
+
+
+class Lexer:
+
+    def __init__(self):
+        self.state = CODE
+        self.directive = False
+        self.started_in_comment = False
+        self.continues_directive = False
+        self.brackets = [0, 0, 0, 0]
+
+    def in_comment(self):
+        return self.state == BLOCK_COMMENT
+
+    # counts "{", "}", "(" and ")" of one line that are code, not part of a
+    # comment, a string or char literal or a preprocessor directive
+    def scan(self, line):
+        line = line.rstrip("\r\n")
+        state = self.state
+        self.started_in_comment = state == BLOCK_COMMENT
+        self.continues_directive = self.directive
+        directive = self.directive or (state == CODE and line.lstrip().startswith("#"))
+        counts = [0, 0, 0, 0]
+
+        if state == CODE and not special_characters.search(line):
+            if not directive:
+                counts = [line.count("{"), line.count("}"), line.count("("), line.count(")")]
+        elif state == BLOCK_COMMENT and "*" not in line:
+            pass
+        else:
+            for char in line:
+                if state <= SLASH and not directive and char in brackets:
+                    counts[brackets[char]] += 1
+                state = transitions[state].get(char, defaults[state])
+
+        spliced = line.endswith("\\")
+        self.state = (end_of_spliced_line if spliced else end_of_line)[state]
+        self.directive = directive and spliced
+        self.brackets = counts
+        return counts
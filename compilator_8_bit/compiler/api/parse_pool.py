@@ -0,0 +1,130 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.db import transaction
+from compiler.models import Folder, File, Section, SectionType, SourceBlob
+from .parser import Parser, ParseError, ParseCache
+from .section import SectionApi
+
+
+# runs in a worker process without touching the database: only the text
+# goes in and only the sections come out; any error stays with its file
+# instead of ending the whole run through executor.map
+def parse_source(source_hash, source_code):
+    try:
+        return source_hash, Parser(source_code.split("\n"), 0).parse_source_code(), None
+    except ParseError as error:
+        return source_hash, None, str(error)
+    except Exception as error:
+        return source_hash, None, f"{type(error).__name__}: {error}"
+
+
+# parses many files in a pool of processes and writes their sections in
+# batches, a fixed number of queries per batch
+class ParsePool:
+
+    def __init__(self, workers, batch_size):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+
+    # enabled files of the workspace, or of an enabled folder and its
+    # enabled subfolders
+    def get_files(self, folder_id=None):
+        files = File.objects.filter(enabled=True)
+        if folder_id is not None:
+            files = files.filter(folder_id__in=self.__get_subtree(folder_id))
+        return files.order_by("id")
+
+    # files whose sections are up to date are skipped unless force is set;
+    # progress(done, total) is called after every batch
+    def parse(self, files, force=False, progress=None):
+        rows = list(files.values_list("id", "blob_id", "parsed_hash"))
+        stale = [file_id for file_id, source_hash, parsed_hash in rows
+                 if force or parsed_hash != ParseCache.get_parse_key(source_hash)]
+        section_types = {section_type.name: section_type for section_type in SectionType.objects.all()}
+        result = {"parsed": 0, "skipped": len(rows) - len(stale), "failed": []}
+
+        with self.__get_executor() as executor:
+            for start in range(0, len(stale), self.batch_size):
+                batch = stale[start:start + self.batch_size]
+                self.__parse_batch(executor, batch, section_types, result)
+                if progress is not None:
+                    progress(start + len(batch), len(stale))
+        return result
+
+    def __parse_batch(self, executor, batch, section_types, result):
+        files = list(File.objects.filter(pk__in=batch).only("id", "blob"))
+        parse_cache = ParseCache()
+        sections_by_hash = parse_cache.get_many(set(file.source_hash for file in files))
+        errors = {}
+        # every distinct text is read and parsed once, however many files share it
+        sources = {}
+        missing = set(file.source_hash for file in files) - set(sections_by_hash)
+        if missing:
+            sources = {blob.hash: blob.get_source_code() for blob in SourceBlob.objects.filter(pk__in=missing)}
+        chunksize = max(1, len(sources) // (self.workers * 4))
+        parsed = {}
+        for source_hash, sections, error in executor.map(parse_source, sources.keys(), sources.values(),
+                                                         chunksize=chunksize):
+            if error is None:
+                parsed[source_hash] = sections
+            else:
+                errors[source_hash] = error
+        parse_cache.set_many(parsed)
+        sections_by_hash.update(parsed)
+
+        written = []
+        for file in files:
+            if file.source_hash in errors:
+                result["failed"].append((file.id, errors[file.source_hash]))
+                continue
+            try:
+                SectionApi.validate_intervals([(data["start_line"], data["end_line"])
+                                               for data in sections_by_hash[file.source_hash]])
+            except ValueError as error:
+                result["failed"].append((file.id, str(error)))
+                continue
+            written.append(file)
+
+        self.__write(written, sections_by_hash, section_types)
+        result["parsed"] += len(written)
+
+    # one transaction per batch: old sections out, new ones in, files
+    # marked as parsed
+    def __write(self, files, sections_by_hash, section_types):
+        for file in files:
+            file.parsed_hash = ParseCache.get_parse_key(file.source_hash)
+
+        with transaction.atomic():
+            Section.objects.filter(file_id__in=[file.id for file in files]).delete()
+            SectionApi.insert_sections([(file.id, sections_by_hash[file.source_hash]) for file in files],
+                                       section_types)
+            File.objects.bulk_update(files, ["parsed_hash"])
+
+    # one process parses in place, without the cost of a pool
+    def __get_executor(self):
+        if self.workers == 1:
+            return InlineExecutor()
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+
+    # ids of the folder and of all enabled folders below it, from one query
+    def __get_subtree(self, folder_id):
+        children = {}
+        for id, parent_id in Folder.objects.filter(enabled=True).values_list("id", "parent_id"):
+            children.setdefault(parent_id, []).append(id)
+
+        subtree = [folder_id]
+        for id in subtree:
+            subtree += children.get(id, [])
+        return subtree
+
+
+class InlineExecutor:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def map(self, fn, *iterables, chunksize=1):
+        return map(fn, *iterables)
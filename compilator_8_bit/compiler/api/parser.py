@@ -1,5 +1,11 @@
 import re
+from django.conf import settings
+from django.core.cache import cache
 from compiler.models import File
+from .lexer import Lexer
+
+# bump whenever parsing rules change, so stored and cached parses are redone
+PARSER_VERSION = 2
 
 DIRECTIVE = "directive"
 VARIABLE = "variable"
@@ -23,162 +29,203 @@ regex_patterns = {
     "asm_floor_end": "^__endasm\s*;"
 }
 
+# all patterns joined into one alternation, tried in the order above; the
+# name of the matching group is the key of the first pattern that matches
+line_pattern = re.compile("|".join(
+    f"(?P<{key}>{rx if rx.startswith('^') else '.*' + rx})" for key, rx in regex_patterns.items()
+))
+
+def classify_line(line):
+    match = line_pattern.match(line.strip())
+    if match:
+        return match.lastgroup
+    return None
+
+class ParseError(ValueError):
+    pass
+
 class Parser:
 
     def __init__(self, lines, counter_start):
         self.lines = lines
         self.counter_start = counter_start
         self.counter = counter_start
-        self.line_exists = True
         self.data = []
-        self.section_name = None
-        self.start_line = None
-        self.end_line = None
-
-    def __parse_line(self, line):
-        for key, rx in regex_patterns.items():
-            match = re.search(rx, line.strip())
-            if match:
-                return key, match
-        return None, None
-    
-    def __append_data(self):
-        self.data.append({
-            "section_name": self.section_name,
-            "start_line": self.start_line,
-            "end_line": self.end_line
-        })
-
-    def __count_brackets(self, match, bracket_type):
-        brackets = 0
-        for bracket in match:
-            if bracket == bracket_type:
-                brackets+=1
-            else:
-                brackets-=1
-        return brackets
+        self.scopes = []
+        self.lexer = Lexer()
+
+    def __section(self, section_name, start_line, end_line):
+        return {
+            "section_name": section_name,
+            "start_line": start_line,
+            "end_line": end_line,
+            "parent_start_line": self.scopes[-1]["start_line"] if self.scopes else None
+        }
+
+    # lines going on with a comment or a directive from the line above are
+    # not classified on their own
+    def __classify(self, line):
+        if self.lexer.started_in_comment:
+            return None
+        if self.lexer.continues_directive:
+            return DIRECTIVE
+        return classify_line(line)
+
+    # every line read is counted into the open procedures; once the closing
+    # bracket of the innermost one is read, its body has no more lines
+    def __next_line(self):
+        if self.scopes and self.scopes[-1]["closed"]:
+            return None
+        line = next(self.iterator, None)
+        if line is None:
+            if self.scopes:
+                raise ParseError(f"Unbalanced brackets in section starting at line {self.scopes[-1]['start_line']}")
+            return None
+        self.counter += 1
 
-    def parse_source_code(self):
+        opening, closing, _, _ = self.lexer.scan(line)
+        if opening or closing:
+            for scope in self.scopes:
+                scope["brackets"] += opening - closing
+                scope["closed"] = scope["brackets"] <= 0
+        return line
+
+    # next line of a section that has to be closed by a later line
+    def __next_section_line(self):
+        line = self.__next_line()
+        if line is None:
+            raise ParseError(f"Section starting at line {self.section_start} is not closed")
+        return line
+
+    # reads on while lines have the given key, returns the first other line
+    def __skip_key(self, key):
+        line = self.__next_line()
+        while line is not None and self.__classify(line) == key:
+            line = self.__next_line()
+        return line
+
+    def __skip_until_key(self, key):
+        line = self.__next_section_line()
+        while self.__classify(line) != key:
+            line = self.__next_section_line()
+
+    # brackets of the line just read open the procedure starting on it
+    def __open_scope(self, start_line):
+        opening, closing, _, _ = self.lexer.brackets
+        return {
+            "start_line": start_line,
+            "brackets": opening - closing,
+            "closed": opening + closing > 0 and opening <= closing
+        }
+
+    # yields every section as soon as its last line is read, so the lines may
+    # come from any iterator, e.g. an open file, and are not kept in memory
+    def parse(self):
         self.counter = self.counter_start
-        iterator = iter(self.lines)
+        self.iterator = iter(self.lines)
+        self.scopes = []
+        self.lexer = Lexer()
+        yield from self.__parse_scope()
 
-        line = next(iterator)
-        self.counter += 1
+    def parse_source_code(self):
+        self.data = sorted(self.parse(), key=lambda section: section["start_line"])
+        return self.data
 
-        while self.line_exists:
-            key, match = self.__parse_line(line)
+    # sections nested in the procedures they lie in, children in line order
+    def get_tree(self):
+        nodes = {}
+        tree = []
+        for section in self.data:
+            node = dict(section, children=[])
+            nodes[section["start_line"]] = node
+            if section["parent_start_line"] is None:
+                tree.append(node)
+            else:
+                nodes[section["parent_start_line"]]["children"].append(node)
+        return tree
 
-            if key == "ifdefine":
-                self.start_line = self.counter
-                self.section_name = DIRECTIVE
-                while key != "enddefine":
-                    line = next(iterator)
-                    self.counter += 1
-                    key, match = self.__parse_line(line)
-                self.end_line = self.counter
-                self.__append_data()
-
-            if key in [DIRECTIVE, VARIABLE]:
-                self.start_line = self.counter
-                self.section_name = key
-                prev_key = key
-                while key == prev_key:
-                    line = next(iterator)
-                    self.counter += 1
-                    key, match = self.__parse_line(line)
-                self.end_line = self.counter - 1
-                self.__append_data()
-                continue
+    # parses the whole file or, with a procedure on the scope stack, its body
+    def __parse_scope(self):
+        line = self.__next_line()
+
+        while line is not None:
+            key = self.__classify(line)
+            self.section_start = self.counter
 
-            if key == "line_comment":
-                self.start_line = self.counter
-                self.section_name = COMMENT
-                while key == "line_comment":
-                    line = next(iterator)
-                    self.counter += 1
-                    key, match = self.__parse_line(line)
-                self.end_line = self.counter - 1
-                self.__append_data()
+            if key == "ifdefine":
+                self.__skip_until_key("enddefine")
+                yield self.__section(DIRECTIVE, self.section_start, self.counter)
+
+            if key in [DIRECTIVE, VARIABLE, "line_comment"]:
+                line = self.__skip_key(key)
+                end_line = self.counter if line is None else self.counter - 1
+                section_name = COMMENT if key == "line_comment" else key
+                yield self.__section(section_name, self.section_start, end_line)
                 continue
 
             if key == "block_line_comment":
-                self.start_line = self.counter
-                self.section_name = COMMENT
-                self.end_line = self.counter
-                self.__append_data()
+                yield self.__section(COMMENT, self.section_start, self.counter)
             
             if key == "block_comment":
-                self.start_line = self.counter
-                self.section_name = COMMENT
-                while key != "end_block_comment":
-                    line = next(iterator)
-                    self.counter += 1
-                    key, match = self.__parse_line(line)
-                self.end_line = self.counter
-                self.__append_data()
+                while self.lexer.in_comment():
+                    self.__next_section_line()
+                yield self.__section(COMMENT, self.section_start, self.counter)
             
             if key in [PROCEDURE, ASSEMBLY]:
-                self.start_line = self.counter
-                self.section_name = key
-                brackets = 0
-                match = re.findall("[\{\}]", line)
-                if len(match):
-                    brackets += self.__count_brackets(match, "{")
-                else:
-                    while len(match) == 0:
-                        line = next(iterator)
-                        self.counter += 1
-                        match = re.findall("[\{\}]", line)
-                    brackets += self.__count_brackets(match, "{")
-
-                while brackets > 0:
-                    line = next(iterator)
-                    self.counter += 1
-                    match = re.findall("[\{\}]", line)
-                    brackets += self.__count_brackets(match, "{")
-
-                self.end_line = self.counter
-                self.__append_data()
+                start_line = self.section_start
+                scope = self.__open_scope(start_line)
+                if not scope["closed"]:
+                    self.scopes.append(scope)
+                    yield from self.__parse_scope()
+                    self.scopes.pop()
+                yield self.__section(key, start_line, self.counter)
             
             if key == "asm_round":
-                self.start_line = self.counter
-                self.section_name = ASSEMBLY
-                brackets = 0
-                match = re.findall("[\(\)]", line)
-                if len(match):
-                    brackets += self.__count_brackets(match, "(")
-                else:
-                    while len(match) == 0:
-                        line = next(iterator)
-                        self.counter += 1
-                        match = re.findall("[\(\)]", line)
-                    brackets += self.__count_brackets(match, "(")
+                _, _, opening, closing = self.lexer.brackets
+                while not (opening or closing):
+                    self.__next_section_line()
+                    _, _, opening, closing = self.lexer.brackets
+                brackets = opening - closing
 
                 while brackets > 0:
-                    line = next(iterator)
-                    self.counter += 1
-                    match = re.findall("[\(\)]", line)
-                    brackets += self.__count_brackets(match, "(")
+                    self.__next_section_line()
+                    _, _, opening, closing = self.lexer.brackets
+                    brackets += opening - closing
 
-                self.end_line = self.counter
-                self.__append_data()
+                yield self.__section(ASSEMBLY, self.section_start, self.counter)
             
             if key == "asm_floor_start":
-                self.start_line = self.counter
-                self.section_name = ASSEMBLY
-                while key != "asm_floor_end":
-                    line = next(iterator)
-                    self.counter += 1
-                    key, match = self.__parse_line(line)
-                self.end_line = self.counter
-                self.__append_data()
-
-            try:
-                line = next(iterator)
-                self.counter += 1
-            except:
-                self.line_exists = False
-        
-        for section in self.data:
-            print(section)
-        return self.data
\ No newline at end of file
+                self.__skip_until_key("asm_floor_end")
+                yield self.__section(ASSEMBLY, self.section_start, self.counter)
+
+            line = self.__next_line()
+
+
+class ParseCache:
+
+    @staticmethod
+    def get_parse_key(source_hash):
+        return f"{PARSER_VERSION}:{source_hash}"
+
+    # sections of the lines whose source has the given hash, parsed at most
+    # once for all files sharing it
+    def get_sections(self, source_hash, lines):
+        key = self.__get_cache_key(source_hash)
+        sections = cache.get(key)
+        if sections is None:
+            sections = Parser(lines, 0).parse_source_code()
+            cache.set(key, sections, settings.PARSE_CACHE_TIMEOUT)
+        return sections
+
+    # cached sections by source hash, hashes never parsed are missing
+    def get_many(self, source_hashes):
+        keys = {self.__get_cache_key(source_hash): source_hash for source_hash in source_hashes}
+        return {keys[key]: sections for key, sections in cache.get_many(list(keys)).items()}
+
+    def set_many(self, sections_by_hash):
+        cache.set_many({self.__get_cache_key(source_hash): sections
+                        for source_hash, sections in sections_by_hash.items()},
+                       settings.PARSE_CACHE_TIMEOUT)
+
+    def __get_cache_key(self, source_hash):
+        return "parse:" + self.get_parse_key(source_hash)
@@ -1,20 +1,37 @@
-from django.db.models import Q
-from compiler.models import Section, SectionType, SectionStatus
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import Q, F, Value
+from django.db.models.functions import Concat
+from compiler.models import File, Section, SectionType, SectionStatus
 from .file import FileApi
+from .parser import Parser, ParseCache
+from .source_lines import SourceLines
 
 class SectionApi:
     def __init__(self, file_id):
         file_api = FileApi()
         self.file = file_api.get(file_id)
-        self.source_code = self.file.source_code.split("\n")
-        self.total_lines = len(self.source_code)
+        self.lines = SourceLines(self.file)
+        self.total_lines = self.lines.count()
+
+    # all lines of the file, split only when asked for
+    @property
+    def source_code(self):
+        return self.lines.get(1, self.total_lines)
     
     def get(self):
         return Section.objects.filter(file_id = self.file.id)
 
+    # sections keep only their line range, the text is read from the file
+    def get_section_lines(self, section):
+        return self.lines.get(section.start_line, section.end_line)
+
     def delete(self):
         sections = self.get()
         sections.delete()
+        self.__set_parsed_hash("")
     
     def create(self, data):
         start_line = data.get("start_line", 0)
@@ -29,17 +46,79 @@ class SectionApi:
             end_line = end_line,
             section_type = section_type,
             name = data.get("name", ""),
-            description = data.get("description", ""),
-            source_code = (self.source_code)[start_line - 1 : end_line]
+            description = data.get("description", "")
         )
         section.save()
+        self.__set_parsed_hash("")
     
+    # creates many sections with a fixed number of queries, all or none;
+    # sections_data may be a generator, e.g. Parser.parse()
+    def bulk_create(self, sections_data):
+        sections_data = list(sections_data)
+        for data in sections_data:
+            self.__validate_line_numbers(data.get("start_line", 0), data.get("end_line", 0))
+
+        existing = list(self.get().values_list("start_line", "end_line"))
+        new = [(data["start_line"], data["end_line"]) for data in sections_data]
+        self.validate_intervals(existing + new)
+
+        names = set(data["section_name"] for data in sections_data)
+        section_types = {section_type.name: section_type
+                         for section_type in SectionType.objects.filter(name__in=names)}
+
+        with transaction.atomic():
+            self.insert_sections([(self.file.id, sections_data)], section_types)
+            self.__set_parsed_hash("")
+
+    # sections of many files from parsed or posted data, given as pairs of
+    # file id and sections, written in one executemany without a model
+    # instance per section; types are looked up by name in section_types
+    @staticmethod
+    def insert_sections(sections_by_file, section_types):
+        create_date = connection.ops.adapt_datetimefield_value(timezone.now())
+        rows = []
+        for file_id, sections_data in sections_by_file:
+            for data in sections_data:
+                if data["section_name"] not in section_types:
+                    raise SectionType.DoesNotExist("SectionType matching query does not exist.")
+                rows.append((file_id, data["start_line"], data["end_line"], section_types[data["section_name"]].id,
+                             data.get("name", ""), data.get("description", ""), "", create_date))
+        if not rows:
+            return
+
+        fields = ["file", "start_line", "end_line", "section_type", "name", "description", "status_data", "create_date"]
+        columns = ", ".join(connection.ops.quote_name(Section._meta.get_field(name).column) for name in fields)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {connection.ops.quote_name(Section._meta.db_table)} ({columns}) "
+                               f"VALUES ({', '.join(['%s'] * len(fields))})", rows)
+
+    # replaces all sections of the file in one transaction
+    def replace(self, sections_data):
+        with transaction.atomic():
+            self.delete()
+            self.bulk_create(sections_data)
+
+    # sections are parsed again only when the source or the parser changed
+    # since the last parse; returns whether they were
+    def parse(self):
+        source_hash = self.file.source_hash
+        parse_key = ParseCache.get_parse_key(source_hash)
+        if self.file.parsed_hash == parse_key:
+            return False
+
+        sections_data = ParseCache().get_sections(source_hash, self.lines.iter_from(1))
+        with transaction.atomic():
+            self.replace(sections_data)
+            self.__set_parsed_hash(parse_key)
+        return True
+
+    def __set_parsed_hash(self, parsed_hash):
+        if self.file.parsed_hash != parsed_hash:
+            File.objects.filter(pk=self.file.id).update(parsed_hash=parsed_hash)
+            self.file.parsed_hash = parsed_hash
+
     def clear_status_data(self):
-        sections = self.get()
-        for section in sections:
-            section.section_status_id = None
-            section.status_data = ""
-            section.save()
+        self.get().update(section_status=None, status_data="")
     
     def update_status_data(self, status, data):
         section_status = self.__get_section_status_instance(status)
@@ -47,66 +126,205 @@ class SectionApi:
         line_content = data["line_content"]
         sections = self.get().filter(start_line__lte=line_id,
                                           end_line__gte=line_id)
-        for section in sections:
-            section.section_status = section_status
-            section.status_data += line_content + ","
-            section.save()
+        sections.update(section_status=section_status,
+                        status_data=Concat(F("status_data"), Value(line_content + ",")))
 
     def update_status(self, status):
         section_status = self.__get_section_status_instance(status)
         sections = self.get().filter(section_status_id__isnull = True)
-        for section in sections:
-            section.section_status = section_status
-            section.save()
+        sections.update(section_status=section_status)
     
+    # same result as clear_status_data, update_status_data for every line
+    # and update_status, with a fixed number of queries
+    def apply_compilation_statuses(self, status, error_lines):
+        final_status = status
+        if status == "Compiled with warnings":
+            final_status = "Compiled without warnings"
+        section_statuses = {section_status.name: section_status for section_status
+                            in SectionStatus.objects.filter(name__in=[status, final_status])}
+        if len(section_statuses) != len(set([status, final_status])):
+            raise SectionStatus.DoesNotExist("SectionStatus matching query does not exist.")
+
+        sections = list(self.get().only("id", "start_line", "end_line"))
+        status_data = self.__map_lines_to_sections(sections, error_lines)
+
+        updated = []
+        for section in sections:
+            if section.id in status_data:
+                section.section_status = section_statuses[status]
+                section.status_data = status_data[section.id]
+                updated.append(section)
+
+        with transaction.atomic():
+            self.get().update(section_status=section_statuses[final_status], status_data="")
+            Section.objects.bulk_update(updated, ["section_status", "status_data"])
+
+    # every section collects the diagnostics of the lines it spans, in stderr
+    # order; lines are sorted once and each section bisects its own range
+    def __map_lines_to_sections(self, sections, error_lines):
+        lines = sorted((int(line["line_id"]), order) for order, line in enumerate(error_lines))
+        status_data = {}
+        for section in sections:
+            first = bisect_left(lines, (section.start_line, -1))
+            last = bisect_right(lines, (section.end_line, len(lines)))
+            if first < last:
+                orders = sorted(order for line_id, order in lines[first:last])
+                status_data[section.id] = "".join(error_lines[order]["line_content"] + "," for order in orders)
+        return status_data
+
     def get_source_code_enriched(self, source_code):
-        sections = self.get()
+        sections = list(self.get().select_related("section_type", "section_status"))
+        starting = {}
+        ending = set()
+        for section in sections:
+            starting.setdefault(section.start_line, section)
+            ending.add(section.end_line)
+        inner = self.__find_inner(sections)
 
         data = []
         for counter, line in enumerate(source_code, start=1):
             start_line = 0
             end_line = 0
-            end_div = False
             section_type = ""
             section_status = ""
             class_name = ""
-            section = next(filter(lambda el: el.start_line == counter, sections), None)
+            section = starting.get(counter)
             if section:
                 start_line = section.start_line
                 end_line = section.end_line
                 section_type = section.section_type.name
                 if section.section_status:
                     section_status = section.section_status.name
-                section = next(filter(lambda el: el.start_line < section.start_line and el.end_line > section.end_line, sections), None)
-                if section:
+                if section.id in inner:
                     class_name = "code-section-inner"
                 else:
                     class_name = "code-section-outer"
-            section = next(filter(lambda el: el.end_line == counter, sections), None)
-            if section:
-                end_div = True
             
             data.append({
                 "line": line,
                 "start_line": start_line,
                 "end_line": end_line,
-                "end_div": end_div,
+                "end_div": counter in ending,
                 "section_type": section_type,
                 "section_status": section_status,
                 "class_name": class_name
             })
         return data
     
+    # ids of sections lying strictly inside another one; going by start
+    # line, a section is inside iff some section starting earlier ends later
+    def __find_inner(self, sections):
+        inner = set()
+        max_end = 0
+        by_start = sorted(sections, key=lambda section: section.start_line)
+        for _, group in groupby(by_start, key=lambda section: section.start_line):
+            group = list(group)
+            for section in group:
+                if max_end > section.end_line:
+                    inner.add(section.id)
+            max_end = max([max_end] + [section.end_line for section in group])
+        return inner
+
     def delete_section(self, start, end):
         section = self.get().filter(start_line = start, end_line = end)
-        section.delete()
+        if section.delete()[0]:
+            self.__set_parsed_hash("")
+
+    # called once deleted lines starting at start_line are gone from the file;
+    # sections above the edit stay, sections below are shifted up and only
+    # the top-level region around the edit is parsed again, up to the first
+    # line from which the new parse goes the same way as the stored one
+    def reparse_after_delete(self, start_line, deleted):
+        if deleted == 0:
+            return
+        # stays a parse of the whole source if it was one before the delete
+        parsed = self.file.parsed_hash.startswith(ParseCache.get_parse_key(""))
+        blocks = self.__get_top_level_blocks()
+        block_starts = [block_start for block_start, block_end in blocks]
+
+        # stored sections start a fresh parse on their first line and on
+        # every line outside of them
+        def is_boundary(line):
+            index = bisect_right(block_starts, line) - 1
+            return index < 0 or not blocks[index][0] < line <= blocks[index][1]
+
+        region_start = start_line
+        index = bisect_right(block_starts, start_line - 1) - 1
+        if index >= 0 and blocks[index][1] >= start_line - 1:
+            region_start = blocks[index][0]
+
+        sections_data = []
+        resume = None
+        if region_start >= start_line and is_boundary(region_start + deleted):
+            resume = region_start
+        else:
+            parser = Parser(self.lines.iter_from(region_start), region_start - 1)
+            for section in parser.parse():
+                sections_data.append(section)
+                if section["parent_start_line"] is not None:
+                    continue
+                if section["start_line"] >= start_line and is_boundary(section["start_line"] + deleted):
+                    resume = section["start_line"]
+                    break
+                if section["end_line"] + 1 >= start_line and is_boundary(section["end_line"] + 1 + deleted):
+                    resume = section["end_line"] + 1
+                    break
+        if resume is not None:
+            sections_data = [data for data in sections_data if data["start_line"] < resume]
+
+        with transaction.atomic():
+            region = self.get().filter(start_line__gte=region_start)
+            if resume is not None:
+                region = region.filter(start_line__lt=resume + deleted)
+            region.delete()
+            if resume is not None:
+                self.get().filter(start_line__gte=resume + deleted) \
+                    .update(start_line=F("start_line") - deleted, end_line=F("end_line") - deleted)
+            self.bulk_create(sections_data)
+            if parsed:
+                self.__set_parsed_hash(ParseCache.get_parse_key(self.file.source_hash))
+
+    # stored sections merged into disjoint top-level (start, end) blocks
+    def __get_top_level_blocks(self):
+        blocks = []
+        for start, end in self.get().order_by("start_line").values_list("start_line", "end_line"):
+            if blocks and start <= blocks[-1][1]:
+                blocks[-1][1] = max(blocks[-1][1], end)
+            else:
+                blocks.append([start, end])
+        return blocks
 
     def __get_section_status_instance(self, status):
         return SectionStatus.objects.get(name=status)
     
-    def __validate_range(self, start, end):
+    def __validate_line_numbers(self, start, end):
         if start <= 0 or end <=0 or start > end or start > self.total_lines or end > self.total_lines:
             raise ValueError("Start and end line values are wrong!")
+
+    def __validate_range(self, start, end):
+        self.__validate_line_numbers(start, end)
         
         if self.get().filter(Q(start_line__gt=start, end_line__gt=end, start_line__lte=end) | Q(start_line__lt=start, end_line__lt=end, end_line__gte=start) | Q(start_line=start) | Q(end_line=end)).exists():
             raise ValueError('Section conflict detected')
+
+    # same rule as __validate_range, checked for a whole set of sections:
+    # sections may nest or be disjoint, but never share a first or last line
+    # or overlap partially. Sweeps intervals sorted by start with a stack of
+    # the ones still open.
+    @staticmethod
+    def validate_intervals(intervals):
+        starts = set()
+        ends = set()
+        for start, end in intervals:
+            if start in starts or end in ends:
+                raise ValueError('Section conflict detected')
+            starts.add(start)
+            ends.add(end)
+
+        open_ends = []
+        for start, end in sorted(intervals):
+            while open_ends and open_ends[-1] < start:
+                open_ends.pop()
+            if open_ends and open_ends[-1] < end:
+                raise ValueError('Section conflict detected')
+            open_ends.append(end)
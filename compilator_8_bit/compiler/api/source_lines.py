@@ -0,0 +1,55 @@
+from array import array
+from compiler.models import File
+
+
+# lines of a file read through its line offsets, in time proportional to the
+# lines asked for rather than to the whole text
+class SourceLines:
+
+    def __init__(self, file):
+        self.source_code = file.source_code
+        self.offsets = array("I")
+        # files saved before the offsets were kept get them computed here
+        self.offsets.frombytes(bytes(file.line_offsets) or File.get_line_offsets(file.source_code))
+
+    def count(self):
+        return len(self.offsets) - 1
+
+    # lines start_line to end_line, both included and counted from 1
+    def get(self, start_line, end_line):
+        end_line = min(end_line, self.count())
+        if start_line > end_line:
+            return []
+        return self.source_code[self.offsets[start_line - 1] : self.offsets[end_line] - 1].split("\n")
+
+    # lines from start_line to the end of the file, one at a time
+    def iter_from(self, start_line):
+        source_code = self.source_code
+        offsets = self.offsets
+        for line in range(start_line, self.count() + 1):
+            yield source_code[offsets[line - 1] : offsets[line] - 1]
+
+    # the text and line offsets without lines start_line to end_line, and the
+    # number of lines removed
+    def delete(self, start_line, end_line):
+        count = self.count()
+        first = min(max(start_line - 1, 0), count)
+        last = min(max(end_line, first), count)
+        deleted = last - first
+        if deleted == 0:
+            return self.source_code, self.offsets.tobytes(), 0
+
+        offsets = self.offsets
+        if last < count:
+            removed = offsets[last] - offsets[first]
+            source_code = self.source_code[:offsets[first]] + self.source_code[offsets[last]:]
+            new_offsets = offsets[:first]
+            new_offsets.extend(offset - removed for offset in offsets[last:])
+        elif first > 0:
+            # the last lines go with the line break before them
+            source_code = self.source_code[:offsets[first] - 1]
+            new_offsets = offsets[:first + 1]
+        else:
+            source_code = ""
+            new_offsets = array("I", [0, 1])
+        return source_code, new_offsets.tobytes(), deleted
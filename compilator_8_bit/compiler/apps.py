@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CompilerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'compiler'
+
+    def ready(self):
+        from . import signals
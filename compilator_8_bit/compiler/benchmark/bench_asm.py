@@ -0,0 +1,83 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_asm.py"
+import re
+import time
+from pathlib import Path
+from django.template import Context, Template
+from django.test import SimpleTestCase
+from compiler.api.compiler import Compiler
+from compiler.api.compile_result import CompileResult
+from compiler.benchmark.parse_benchmark import SyntheticCorpus
+
+# lines of the generated sources, the listings are a few times longer
+SOURCE_LINES = [2000, 10000, 40000]
+
+
+# per line regex strings and dicts the compiler used to build, kept as the baseline
+def enrich_asm_dicts(lines):
+    class_header = "asm-header"
+    class_body = "asm-body"
+    file_name = "source.c"
+    regex =  "^;\t*\s*" + file_name + ":\s*\d+"
+    regex_repl = ";\t*\s*" + file_name + ":\s*"
+
+    is_body = True
+    data = []
+    for line in lines:
+        source_code_line = 0
+        if is_body == True and line.startswith(";-----------------"):
+            data.append({"code": line, "start": True, "start_class": class_header, "position": "before", "source_code_line": source_code_line})
+            is_body = False
+        elif is_body == False and line.startswith(";-----------------"):
+            data.append({"code": line, "start": True, "start_class": class_body, "position": "after", "source_code_line": source_code_line})
+            is_body = True
+        elif is_body == False and line.startswith(";"):
+            data.append({"code": line, "start": False, "source_code_line": source_code_line})
+        elif is_body == True and line.startswith(";"):
+            match = re.search(regex, line)
+            if match:
+                source_code_line = int(re.sub(regex_repl, "", match.group(0)))
+            data.append({"code": line, "start": False, "source_code_line": source_code_line})
+        else:
+            data.append({"code": line, "start": False, "source_code_line": source_code_line})
+    return data
+
+
+class AsmBenchmark(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the listing loop of compiled.html, rendered for both representations
+        template = Path(__file__).parent.parent / "templates" / "compiler" / "compiled.html"
+        fragment = re.search("{% block fragment %}(.*){% endblock %}", template.read_text(), re.S)
+        cls.template = Template(fragment.group(1))
+
+    def test_asm(self):
+        print()
+        print("asm enrichment of a generated sdcc listing")
+        for source_lines in SOURCE_LINES:
+            corpus = SyntheticCorpus()
+            asm = corpus.get_asm(corpus.generate(source_lines))
+            before = self.__measure(lambda: enrich_asm_dicts(asm))
+            after = self.__measure(lambda: self.__enrich_asm(asm))
+
+            self.assertEqual(before["data"], [line.as_dict() for line in after["data"]])
+            self.assertEqual(self.__render(before["data"]), self.__render(after["data"]))
+            print(f"  {len(asm):7d} lines")
+            print(f"    dicts:   {before['time']:8.3f} s {len(asm) / before['time']:10.0f} lines/s")
+            print(f"    records: {after['time']:8.3f} s {len(asm) / after['time']:10.0f} lines/s")
+
+    def __enrich_asm(self, asm):
+        compiler = Compiler("bench")
+        compiler.result = CompileResult(0, b"", "\n".join(asm))
+        return compiler.get_asm()[1]
+
+    def __render(self, asm_code):
+        return self.template.render(Context({"asm_code": asm_code, "asm_name": "bench.asm"}))
+
+    def __measure(self, enrich):
+        start = time.perf_counter()
+        data = enrich()
+        elapsed = time.perf_counter() - start
+        return {"data": data, "time": elapsed}
@@ -0,0 +1,78 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_compiler_sandbox.py"
+import os
+import time
+import uuid
+import tempfile
+import subprocess
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.test import SimpleTestCase
+from compiler.api.compiler import Compiler
+
+CONCURRENCY = 50
+COMPILES = 500
+SOURCE_CODE = "int main(void) {\n    return 0;\n}\n"
+
+# stands in for sdcc: writes a one line .asm next to the source
+STUB_SDCC = """#!/bin/sh
+for last; do :; done
+echo "; stub" > "${last%.c}.asm"
+"""
+
+
+# shell based sandbox the compiler used to run, kept as the baseline
+def compile_with_shell():
+    uid = str(uuid.uuid1())
+    directory = str(settings.COMPILE_SANDBOX_DIR)
+    subprocess.call("cd " + directory + " && mkdir " + uid, shell=True)
+    with open(Path(directory, uid, "source.c"), "w+") as destination:
+        destination.write(SOURCE_CODE)
+    subprocess.call("cd " + str(Path(directory, uid)) + " && sdcc -S --std-c11 -mstm8 source.c"
+                    " 1>source.stdout 2>source.stderr", shell=True)
+    Path(directory, uid, "source.stderr").read_bytes()
+    Path(directory, uid, "source.asm").read_bytes()
+    subprocess.call("cd " + directory + " && rm -rf " + uid, shell=True)
+
+
+def compile_in_process():
+    compiler = Compiler(None, "c11", "stm8", [], [])
+    compiler.compile_source(SOURCE_CODE)
+    compiler.get_compilation_statuses()
+    compiler.get_asm()
+
+
+class CompilerSandboxBenchmark(SimpleTestCase):
+
+    def setUp(self):
+        self.bin = tempfile.TemporaryDirectory()
+        sdcc = Path(self.bin.name, "sdcc")
+        sdcc.write_text(STUB_SDCC)
+        sdcc.chmod(0o755)
+        self.path = mock.patch.dict(os.environ, {"PATH": self.bin.name + os.pathsep + os.environ["PATH"]})
+        self.path.start()
+        os.makedirs(settings.COMPILE_SANDBOX_DIR, exist_ok=True)
+
+    def tearDown(self):
+        self.path.stop()
+        self.bin.cleanup()
+
+    def test_sandbox_overhead(self):
+        shell = self.__measure(compile_with_shell)
+        in_process = self.__measure(compile_in_process)
+
+        print()
+        print(f"compile sandbox, {COMPILES} compiles, {CONCURRENCY} concurrent")
+        print(f"  shell:      {shell * 1000:8.2f} ms per compile")
+        print(f"  in-process: {in_process * 1000:8.2f} ms per compile")
+
+    def __measure(self, compile):
+        with mock.patch("builtins.print"):
+            with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+                start = time.perf_counter()
+                for future in [executor.submit(compile) for _ in range(COMPILES)]:
+                    future.result()
+                elapsed = time.perf_counter() - start
+        return elapsed / COMPILES
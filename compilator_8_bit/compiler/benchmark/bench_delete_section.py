@@ -0,0 +1,56 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_delete_section.py"
+from django.test import TestCase
+from compiler.api.file import FileApi
+from compiler.api.parser import Parser
+from compiler.api.section import SectionApi
+from compiler.benchmark.queries import measure_queries
+from compiler.models import File
+
+COPIES = [10, 50, 200]
+TIMER_ID = 2
+# lines inside main() of the timer fixture
+DELETED = (385, 386)
+
+
+# whole file parsed again after the delete, as parse_file does, kept as the baseline
+def reparse_all(file_id, start_line, end_line):
+    FileApi().delete_section(file_id, start_line, end_line)
+    section_api = SectionApi(file_id)
+    section_api.replace(Parser(section_api.source_code, 0).parse())
+
+
+def reparse_region(file_id, start_line, end_line):
+    deleted = FileApi().delete_section(file_id, start_line, end_line)
+    SectionApi(file_id).reparse_after_delete(start_line, deleted)
+
+
+class DeleteSectionBenchmark(TestCase):
+    fixtures = ["user.json", "folder.json", "file_timer.json", "section_type.json"]
+
+    def test_delete_section(self):
+        timer = File.objects.get(pk=TIMER_ID)
+        lines = timer.source_code.split("\n")
+
+        print()
+        print(f"delete lines {DELETED[0]}-{DELETED[1]} of the middle copy of the timer source")
+        for copies in COPIES:
+            offset = len(lines) * (copies // 2)
+            start_line, end_line = DELETED[0] + offset, DELETED[1] + offset
+            before = self.__measure(timer, lines * copies, reparse_all, start_line, end_line)
+            after = self.__measure(timer, lines * copies, reparse_region, start_line, end_line)
+
+            self.assertEqual(before["sections"], after["sections"])
+            print(f"  {len(lines) * copies:7d} lines")
+            print(f"    whole file: {before['queries']:4d} queries {before['time']:8.3f} s")
+            print(f"    region:     {after['queries']:4d} queries {after['time']:8.3f} s")
+
+    def __measure(self, file, lines, reparse, start_line, end_line):
+        file.source_code = "\n".join(lines)
+        file.save()
+        section_api = SectionApi(file.id)
+        section_api.replace(Parser(lines, 0).parse())
+
+        measured = measure_queries(lambda: reparse(file.id, start_line, end_line))
+        measured["sections"] = sorted(section_api.get().values_list("section_type__name", "start_line", "end_line"))
+        return measured
@@ -0,0 +1,64 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_folder_tree.py"
+from django.test import TestCase
+from django.contrib.auth.models import User
+from compiler.api.folder_tree import FolderTree
+from compiler.benchmark.queries import measure_queries
+from compiler.models import Folder, File, SourceBlob
+
+FOLDERS = 5000
+FILES = 5000
+BRANCHING = 8
+
+
+# per-node filtering the tree used to be built with, kept as the baseline
+class RecursiveFolderTree:
+    def __init__(self):
+        self.folders = Folder.objects.all()
+        self.files = File.objects.all()
+
+    def get_folder_structure(self):
+        roots = [{'id': elem.id, 'name': elem.name, 'is_file': False}
+                 for elem in self.folders.filter(parent_id__isnull=True, enabled=True)]
+        return self.__traverse_siblings(roots)
+
+    def __traverse_siblings(self, siblings):
+        for elem in siblings:
+            elem['children'] = [{'id': child.id, 'name': child.name, 'is_file': False}
+                                for child in self.folders.filter(parent_id=elem['id'], enabled=True)]
+            if len(elem['children']):
+                self.__traverse_siblings(elem['children'])
+            for child in self.files.filter(folder_id=elem['id'], enabled=True):
+                elem['children'].append({'id': child.id, 'name': child.name, 'is_file': True})
+            elem['has_children'] = (len(elem['children']) > 0)
+        return siblings
+
+
+class FolderTreeBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="bench")
+        Folder.objects.bulk_create([
+            Folder(id=i, name=f"folder_{i}", user=user,
+                   parent_id=None if i == 1 else (i - 2) // BRANCHING + 1)
+            for i in range(1, FOLDERS + 1)
+        ])
+        blob = SourceBlob.objects.create(hash=SourceBlob.get_hash(""), data=b"", ref_count=FILES)
+        File.objects.bulk_create([
+            File(name=f"file_{i}.c", user=user, folder_id=i % FOLDERS + 1, blob=blob)
+            for i in range(FILES)
+        ])
+
+    def test_folder_tree(self):
+        before = self.__measure(RecursiveFolderTree())
+        after = self.__measure(FolderTree())
+
+        self.assertEqual(before["data"], after["data"])
+        print()
+        print(f"folder tree, {FOLDERS + FILES} nodes")
+        print(f"  recursive: {before['queries']:6d} queries {before['time']:8.3f} s")
+        print(f"  bulk:      {after['queries']:6d} queries {after['time']:8.3f} s")
+
+    def __measure(self, folder_tree):
+        return measure_queries(folder_tree.get_folder_structure)
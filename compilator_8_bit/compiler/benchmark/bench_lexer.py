@@ -0,0 +1,54 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_lexer.py"
+import re
+import json
+import base64
+import time
+from pathlib import Path
+from django.test import SimpleTestCase
+from compiler.api.lexer import Lexer
+
+LINES = 100000
+FIXTURES = ["file.json", "file_timer.json"]
+
+
+# per line regex the parser counted brackets with, kept as the baseline;
+# it also counts brackets in strings, comments and directives
+def count_with_regex(lines):
+    brackets = 0
+    for line in lines:
+        for bracket in re.findall("[\\{\\}]", line):
+            brackets += 1 if bracket == "{" else -1
+    return brackets
+
+
+def count_with_lexer(lines):
+    brackets = 0
+    lexer = Lexer()
+    for line in lines:
+        opening, closing, _, _ = lexer.scan(line)
+        brackets += opening - closing
+    return brackets
+
+
+class LexerBenchmark(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.lines = []
+        for fixture in FIXTURES:
+            with open(Path(__file__).parent.parent / "fixtures" / fixture) as file:
+                for entry in json.load(file):
+                    if entry["model"] == "compiler.sourceblob":
+                        cls.lines += base64.b64decode(entry["fields"]["data"]).decode("utf-8").split("\n")
+
+    def test_lexer(self):
+        lines = self.lines * (LINES // len(self.lines) + 1)
+        print()
+        print(f"bracket counting, {len(lines)} lines of the fixture sources")
+        for name, count in [("regex", count_with_regex), ("lexer", count_with_lexer)]:
+            start = time.perf_counter()
+            count(lines)
+            elapsed = time.perf_counter() - start
+            print(f"  {name}: {elapsed:8.3f} s {len(lines) / elapsed:10.0f} lines/s")
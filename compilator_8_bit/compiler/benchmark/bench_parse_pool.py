@@ -0,0 +1,53 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_parse_pool.py"
+import time
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth.models import User
+from compiler.benchmark.parse_benchmark import SyntheticCorpus
+from compiler.api.parse_pool import ParsePool
+from compiler.api.section import SectionApi
+from compiler.models import Folder, File, Section
+
+FILES = 100
+LINES = 5000
+WORKERS = [1, 2, 4]
+BATCH_SIZE = 50
+
+
+class ParsePoolBenchmark(TestCase):
+    fixtures = ["section_type.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="bench")
+        folder = Folder.objects.create(name="bench", user=user)
+        for seed in range(FILES):
+            File.objects.create(name=f"bench_{seed}.c", user=user, folder=folder,
+                                source_code="\n".join(SyntheticCorpus(seed).generate(LINES)))
+
+    def test_parse_pool(self):
+        print()
+        print(f"parse {FILES} files of {LINES} lines")
+        files = File.objects.order_by("id")
+        cache.clear()
+
+        start = time.perf_counter()
+        for file in files:
+            SectionApi(file.id).parse()
+        serial = time.perf_counter() - start
+        expected = list(Section.objects.order_by("file_id", "start_line").values_list("file_id", "start_line", "end_line"))
+        print(f"  one file at a time: {serial:8.3f} s")
+
+        for workers in WORKERS:
+            # every run starts from the same empty tables and cache
+            cache.clear()
+            Section.objects.all().delete()
+            start = time.perf_counter()
+            result = ParsePool(workers, BATCH_SIZE).parse(files, force=True)
+            elapsed = time.perf_counter() - start
+
+            self.assertEqual(result["parsed"], FILES)
+            self.assertEqual(list(Section.objects.order_by("file_id", "start_line")
+                                  .values_list("file_id", "start_line", "end_line")), expected)
+            print(f"  {workers} worker(s):        {elapsed:8.3f} s {serial / elapsed:6.2f}x")
@@ -0,0 +1,56 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_parser.py"
+import re
+import json
+import base64
+import time
+from pathlib import Path
+from unittest import mock
+from django.test import SimpleTestCase
+from compiler.api.parser import Parser, regex_patterns
+
+SIZES = [1000, 10000, 100000]
+FIXTURES = ["file.json", "file_timer.json"]
+
+
+# pattern by pattern search the parser used to do, kept as the baseline
+def classify_line_search(line):
+    for key, rx in regex_patterns.items():
+        match = re.search(rx, line.strip())
+        if match:
+            return key
+    return None
+
+
+class ParserBenchmark(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.lines = []
+        for fixture in FIXTURES:
+            with open(Path(__file__).parent.parent / "fixtures" / fixture) as file:
+                for entry in json.load(file):
+                    if entry["model"] == "compiler.sourceblob":
+                        cls.lines += base64.b64decode(entry["fields"]["data"]).decode("utf-8").split("\n")
+
+    def test_parser(self):
+        print()
+        print("parser, fixture sources repeated")
+        for size in SIZES:
+            # whole copies only, a cut source may end inside a section
+            lines = self.lines * (size // len(self.lines) + 1)
+            with mock.patch("compiler.api.parser.classify_line", classify_line_search):
+                before = self.__measure(lines)
+            after = self.__measure(lines)
+
+            self.assertEqual(before["data"], after["data"])
+            print(f"  {len(lines):7d} lines")
+            print(f"    search:      {before['time']:8.3f} s {len(lines) / before['time']:10.0f} lines/s")
+            print(f"    alternation: {after['time']:8.3f} s {len(lines) / after['time']:10.0f} lines/s")
+
+    def __measure(self, lines):
+        start = time.perf_counter()
+        data = Parser(lines, 0).parse_source_code()
+        elapsed = time.perf_counter() - start
+        return {"data": data, "time": elapsed}
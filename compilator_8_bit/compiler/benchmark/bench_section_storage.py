@@ -0,0 +1,62 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_section_storage.py"
+import os
+import time
+import sqlite3
+import tempfile
+from django.test import SimpleTestCase
+from compiler.benchmark.parse_benchmark import SyntheticCorpus
+from compiler.api.parser import Parser
+
+FILES = [10, 100]
+LINES = 2000
+
+# compiler_section as created by the migrations, before and after the text
+# of a section stopped being stored with it
+COLUMNS = """id integer NOT NULL PRIMARY KEY AUTOINCREMENT, name varchar(100) NOT NULL,
+    description varchar(1000) NOT NULL, create_date datetime NOT NULL, file_id bigint NOT NULL,
+    start_line integer NOT NULL, end_line integer NOT NULL, section_type_id bigint NOT NULL,
+    section_status_id bigint NULL, status_data text NOT NULL"""
+INDEXES = ["CREATE INDEX section_file_id ON section (file_id)",
+           "CREATE INDEX section_section_type_id ON section (section_type_id)",
+           "CREATE INDEX section_section_status_id ON section (section_status_id)"]
+
+
+class SectionStorageBenchmark(SimpleTestCase):
+
+    def test_section_storage(self):
+        print()
+        print(f"sections of files with {LINES} lines each")
+        for files in FILES:
+            rows = []
+            for file_id in range(1, files + 1):
+                source_code = SyntheticCorpus(file_id).generate(LINES)
+                for section in Parser(source_code, 0).parse_source_code():
+                    start_line, end_line = section["start_line"], section["end_line"]
+                    rows.append((file_id, start_line, end_line, str(source_code[start_line - 1 : end_line])))
+
+            before = self.__measure(COLUMNS + ", source_code text NOT NULL",
+                                    ["file_id", "start_line", "end_line", "source_code"], rows)
+            after = self.__measure(COLUMNS, ["file_id", "start_line", "end_line"], [row[:3] for row in rows])
+
+            print(f"  {files:4d} files, {len(rows):7d} sections")
+            print(f"    text in rows: {before['size'] / 1024:8.0f} KiB {len(rows) / before['time']:10.0f} rows/s")
+            print(f"    line ranges:  {after['size'] / 1024:8.0f} KiB {len(rows) / after['time']:10.0f} rows/s")
+
+    # size of the database file and time of inserting the rows into it
+    def __measure(self, columns, names, rows):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "db.sqlite3")
+            connection = sqlite3.connect(path)
+            connection.execute(f"CREATE TABLE section ({columns})")
+            for index in INDEXES:
+                connection.execute(index)
+
+            start = time.perf_counter()
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO section (name, description, create_date, section_type_id, status_data, {', '.join(names)}) "
+                    f"VALUES ('', '', '2023-05-14 11:50:01', 1, '', {', '.join('?' * len(names))})", rows)
+            elapsed = time.perf_counter() - start
+            connection.close()
+            return {"size": os.path.getsize(path), "time": elapsed}
@@ -0,0 +1,38 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_source_blob.py"
+import time
+from django.test import TestCase
+from django.contrib.auth.models import User
+from compiler.api.file import FileApi
+from compiler.benchmark.parse_benchmark import SyntheticCorpus
+from compiler.models import Folder, SourceBlob
+
+# a course: every student uploads each of the lab templates
+STUDENTS = 200
+TEMPLATES = 5
+LINES = 500
+
+
+class SourceBlobBenchmark(TestCase):
+
+    def test_source_blob(self):
+        user = User.objects.create(username="bench")
+        folder = Folder.objects.create(name="labs", user=user)
+        templates = ["\n".join(SyntheticCorpus(seed).generate(LINES)) for seed in range(TEMPLATES)]
+        file_api = FileApi()
+
+        start = time.perf_counter()
+        for student in range(STUDENTS):
+            for template in templates:
+                file_api.create({"folder_id": folder.id, "name": "lab.c", "user": user, "source_code": template})
+        elapsed = time.perf_counter() - start
+
+        # a copy of the text in every row, as File.source_code used to keep it
+        before = STUDENTS * sum(len(template.encode("utf-8")) for template in templates)
+        after = sum(len(blob.data) for blob in SourceBlob.objects.all())
+        uploads = STUDENTS * TEMPLATES
+        print()
+        print(f"{uploads} uploads of {TEMPLATES} templates, {LINES} lines each")
+        print(f"  text in rows: {before / 1024:10.0f} KiB")
+        print(f"  blobs:        {after / 1024:10.0f} KiB")
+        print(f"  uploads:      {uploads / elapsed:10.0f} files/s")
@@ -0,0 +1,90 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_source_enriched.py"
+from django.test import TestCase
+from django.contrib.auth.models import User
+from compiler.api.section import SectionApi
+from compiler.benchmark.queries import measure_queries
+from compiler.models import Folder, File, Section, SectionType, SectionStatus
+
+SIZES = [500, 2000, 5000]
+# every procedure spans PROCEDURE lines and holds one variable section
+PROCEDURE = 10
+
+
+# per-line scan over all sections the view used to do, kept as the baseline
+def get_source_code_enriched_scan(sections, source_code):
+    data = []
+    for counter, line in enumerate(source_code, start=1):
+        start_line = 0
+        end_line = 0
+        end_div = False
+        section_type = ""
+        section_status = ""
+        class_name = ""
+        section = next(filter(lambda el: el.start_line == counter, sections), None)
+        if section:
+            start_line = section.start_line
+            end_line = section.end_line
+            section_type = section.section_type.name
+            if section.section_status:
+                section_status = section.section_status.name
+            section = next(filter(lambda el: el.start_line < section.start_line and el.end_line > section.end_line, sections), None)
+            if section:
+                class_name = "code-section-inner"
+            else:
+                class_name = "code-section-outer"
+        section = next(filter(lambda el: el.end_line == counter, sections), None)
+        if section:
+            end_div = True
+
+        data.append({
+            "line": line,
+            "start_line": start_line,
+            "end_line": end_line,
+            "end_div": end_div,
+            "section_type": section_type,
+            "section_status": section_status,
+            "class_name": class_name
+        })
+    return data
+
+
+class SourceEnrichedBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="bench")
+        cls.folder = Folder.objects.create(name="bench", user=cls.user)
+        cls.procedure = SectionType.objects.create(name="procedure")
+        cls.variable = SectionType.objects.create(name="variable")
+        cls.status = SectionStatus.objects.create(name="Compiled without warnings")
+
+    def test_source_enriched(self):
+        print()
+        print(f"source code enriched, {PROCEDURE} lines per procedure")
+        for size in SIZES:
+            file, source_code = self.__create_file(size)
+            before = self.__measure(lambda: get_source_code_enriched_scan(
+                SectionApi(file.id).get(), source_code))
+            after = self.__measure(lambda: SectionApi(file.id).get_source_code_enriched(source_code))
+
+            self.assertEqual(before["data"], after["data"])
+            print(f"  {size:6d} lines")
+            print(f"    scan:   {before['queries']:6d} queries {before['time']:8.3f} s")
+            print(f"    linear: {after['queries']:6d} queries {after['time']:8.3f} s")
+
+    def __create_file(self, size):
+        source_code = [f"line {i}" for i in range(1, size + 1)]
+        file = File.objects.create(name=f"bench_{size}.c", user=self.user, folder=self.folder,
+                                   source_code="\n".join(source_code))
+        sections = []
+        for start in range(1, size - PROCEDURE + 2, PROCEDURE):
+            sections.append(Section(file=file, start_line=start, end_line=start + PROCEDURE - 1,
+                                    section_type=self.procedure, section_status=self.status))
+            sections.append(Section(file=file, start_line=start + 1, end_line=start + 1,
+                                    section_type=self.variable))
+        Section.objects.bulk_create(sections)
+        return file, source_code
+
+    def __measure(self, enrich):
+        return measure_queries(enrich)
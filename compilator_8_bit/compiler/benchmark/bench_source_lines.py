@@ -0,0 +1,57 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_source_lines.py"
+import time
+from django.test import SimpleTestCase
+from compiler.benchmark.parse_benchmark import SyntheticCorpus
+from compiler.api.source_lines import SourceLines
+from compiler.models import File
+
+SIZES = [10000, 100000, 1000000]
+# lines of a section in the middle of the file
+RANGE = 20
+REPEAT = 20
+
+
+# whole text split on every request, as the apis used to do, kept as the baseline
+def get_lines_split(file, start_line, end_line):
+    return file.source_code.split("\n")[start_line - 1 : end_line]
+
+
+def delete_lines_split(file, start_line, end_line):
+    splitted = file.source_code.split("\n")
+    del splitted[start_line - 1 : end_line]
+    return "\n".join(splitted)
+
+
+class SourceLinesBenchmark(SimpleTestCase):
+
+    def test_source_lines(self):
+        print()
+        print(f"{RANGE} lines in the middle of a file")
+        for size in SIZES:
+            source_code = "\n".join(SyntheticCorpus().generate(size))
+            file = File(source_code=source_code, line_offsets=File.get_line_offsets(source_code))
+            start_line = source_code.count("\n") // 2
+            end_line = start_line + RANGE - 1
+
+            before = self.__measure(lambda: get_lines_split(file, start_line, end_line))
+            after = self.__measure(lambda: SourceLines(file).get(start_line, end_line))
+            self.assertEqual(before["data"], after["data"])
+
+            before_delete = self.__measure(lambda: delete_lines_split(file, start_line, end_line))
+            after_delete = self.__measure(lambda: SourceLines(file).delete(start_line, end_line)[0])
+            self.assertEqual(before_delete["data"], after_delete["data"])
+
+            print(f"  {size:8d} lines")
+            print(f"    get, split:      {before['time'] * 1000:8.3f} ms")
+            print(f"    get, offsets:    {after['time'] * 1000:8.3f} ms")
+            print(f"    delete, split:   {before_delete['time'] * 1000:8.3f} ms")
+            print(f"    delete, offsets: {after_delete['time'] * 1000:8.3f} ms")
+
+    # mean time of one call
+    def __measure(self, call):
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            data = call()
+        elapsed = (time.perf_counter() - start) / REPEAT
+        return {"data": data, "time": elapsed}
@@ -0,0 +1,213 @@
+# Run with:
+#   python manage.py test compiler/benchmark --pattern="bench_sqlite_concurrency.py"
+import time
+import threading
+from django.conf import settings
+from django.db import connection, transaction, OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from compiler.api.compile_queue import CompileQueue
+from compiler.api.section import SectionApi
+from compiler.benchmark.parse_benchmark import SyntheticCorpus
+from compiler.models import Folder, File, Section, CompileJob
+
+THREADS = [1, 4, 8]
+ITERATIONS = 20
+FILES = 16
+LINES = 300
+# texts every file is switched between, so that each edit is parsed again
+TEXTS = 3
+
+# a report reading every file in one transaction, held for LONG_READ_SECONDS
+# while a writer edits files; both settings wait at most LONG_READ_BUSY_TIMEOUT
+# milliseconds for a lock, so that only the journal differs
+LONG_READ_SECONDS = 2
+LONG_READ_BUSY_TIMEOUT = 500
+
+# a connection as Django opens it untuned: rollback journal and the 5 seconds
+# the sqlite3 module waits for a lock
+DEFAULT_PRAGMAS = {"journal_mode": "delete", "synchronous": "full", "busy_timeout": 5000,
+                   "mmap_size": 0, "cache_size": -2000}
+
+
+# the page of a file, read while others write
+def read(context):
+    list(SectionApi(context["file_id"]).get())
+
+
+def edit(context):
+    file = File.objects.get(pk=context["file_id"])
+    file.source_code = context["texts"][context["iteration"] % TEXTS]
+    file.save()
+
+
+def parse(context):
+    SectionApi(context["file_id"]).parse()
+
+
+def write_statuses(context):
+    SectionApi(context["file_id"]).apply_compilation_statuses("Compiled with warnings", context["error_lines"])
+
+
+# a job claimed and finished, as CompileQueue.run does without sdcc
+def claim(context):
+    job = CompileQueue().claim()
+    if job is not None:
+        job.status = CompileJob.DONE
+        job.save()
+
+
+OPERATIONS = [read, edit, parse, write_statuses, claim]
+
+
+def read_all(context):
+    for file_id in context["file_ids"]:
+        list(Section.objects.filter(file_id=file_id))
+        File.objects.get(pk=file_id).source_code
+
+
+# threads driving the apis on the test database file, each with its own connection
+class SqliteConcurrencyBenchmark(TransactionTestCase):
+    fixtures = ["section_type.json", "section_status.json"]
+
+    def setUp(self):
+        self.user = User.objects.create(username="bench")
+        folder = Folder.objects.create(name="bench", user=self.user)
+        self.texts = ["\n".join(SyntheticCorpus(seed).generate(LINES)) for seed in range(TEXTS)]
+        self.file_ids = [File.objects.create(name=f"bench_{number}.c", user=self.user, folder=folder,
+                                             source_code=self.texts[0]).id for number in range(FILES)]
+        self.error_lines = [{"line_id": str(line), "line_content": f"{line}: warning"}
+                            for line in range(1, LINES, 25)]
+
+    def test_sqlite_concurrency(self):
+        print()
+        print(f"{ITERATIONS} x ({', '.join(operation.__name__ for operation in OPERATIONS)}) "
+              f"per thread on {FILES} files")
+        for threads in THREADS:
+            before = self.__measure(threads, DEFAULT_PRAGMAS)
+            after = self.__measure(threads, settings.SQLITE_PRAGMAS)
+            print(f"  {threads} thread{'' if threads == 1 else 's'}")
+            for name, result in [("default", before), ("tuned", after)]:
+                errors = sum(result["errors"].values())
+                by_operation = ", ".join(f"{operation} {count}" for operation, count in result["errors"].items() if count)
+                print(f"    {name + ':':8s} {result['operations'] / result['time']:8.0f} ops/s "
+                      f"{errors:4d} lock errors of {result['operations'] + errors}"
+                      + (f" ({by_operation})" if by_operation else ""))
+
+    # the rollback journal lets no write commit while the report holds its
+    # shared lock, WAL lets the writer go on and the report read its snapshot
+    def test_write_during_long_read(self):
+        before = self.__measure_long_read(DEFAULT_PRAGMAS)
+        after = self.__measure_long_read(settings.SQLITE_PRAGMAS)
+        print()
+        print(f"edits while one transaction reads all {FILES} files for {LONG_READ_SECONDS} s")
+        for name, result in [("default", before), ("tuned", after)]:
+            print(f"    {name + ':':8s} {result['operations']:8d} edits    "
+                  f"{result['errors']:4d} lock errors, {result['reads']} reads in the report")
+        self.assertGreater(before["errors"], 0)
+        self.assertEqual(after["errors"], 0)
+        self.assertGreater(after["operations"], 0)
+
+    def __measure_long_read(self, pragmas):
+        counts = {"operations": 0, "errors": 0, "reads": 0}
+        failures = []
+        reading = threading.Event()
+        done = threading.Event()
+
+        def report():
+            context = {"file_ids": self.file_ids}
+            try:
+                with transaction.atomic():
+                    read_all(context)
+                    counts["reads"] += 1
+                    reading.set()
+                    deadline = time.monotonic() + LONG_READ_SECONDS
+                    while time.monotonic() < deadline:
+                        read_all(context)
+                        counts["reads"] += 1
+            except Exception as error:
+                failures.append(error)
+            finally:
+                reading.set()
+                done.set()
+                connection.close()
+
+        def write():
+            reading.wait()
+            iteration = 0
+            try:
+                while not done.is_set():
+                    context = {"file_id": self.file_ids[iteration % FILES], "iteration": iteration,
+                               "texts": self.texts}
+                    try:
+                        edit(context)
+                        counts["operations"] += 1
+                    except OperationalError as error:
+                        if "locked" not in str(error):
+                            raise
+                        counts["errors"] += 1
+                    iteration += 1
+            except Exception as error:
+                failures.append(error)
+            finally:
+                connection.close()
+
+        with override_settings(SQLITE_PRAGMAS={**pragmas, "busy_timeout": LONG_READ_BUSY_TIMEOUT}):
+            connection.close()
+            connection.ensure_connection()
+            workers = [threading.Thread(target=report), threading.Thread(target=write)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        connection.close()
+        self.assertEqual(failures, [])
+        return counts
+
+    def __measure(self, threads, pragmas):
+        CompileJob.objects.bulk_create([CompileJob(file_id=self.file_ids[number % FILES], user=self.user,
+                                                   standard="c11", processor="stm8")
+                                        for number in range(threads * ITERATIONS)])
+        counts = {"operations": 0, "errors": {operation.__name__: 0 for operation in OPERATIONS}}
+        failures = []
+        lock = threading.Lock()
+
+        def work(number):
+            operations = 0
+            errors = {operation.__name__: 0 for operation in OPERATIONS}
+            try:
+                for iteration in range(ITERATIONS):
+                    context = {"file_id": self.file_ids[(number + iteration) % FILES], "iteration": number + iteration,
+                               "texts": self.texts, "error_lines": self.error_lines}
+                    for operation in OPERATIONS:
+                        try:
+                            operation(context)
+                            operations += 1
+                        except OperationalError as error:
+                            if "locked" not in str(error):
+                                raise
+                            errors[operation.__name__] += 1
+            except Exception as error:
+                failures.append(error)
+            finally:
+                connection.close()
+            with lock:
+                counts["operations"] += operations
+                for name, count in errors.items():
+                    counts["errors"][name] += count
+
+        # the journal mode is kept in the file and changes only while no
+        # other connection is open, so it is switched here first
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            connection.close()
+            connection.ensure_connection()
+            workers = [threading.Thread(target=work, args=(number,)) for number in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            counts["time"] = time.perf_counter() - start
+        connection.close()
+        self.assertEqual(failures, [])
+        return counts
@@ -0,0 +1,155 @@
+import random
+import tracemalloc
+from django.db import transaction
+from django.contrib.auth.models import User
+from compiler.api.parser import Parser, DIRECTIVE, VARIABLE, PROCEDURE, COMMENT, ASSEMBLY
+from compiler.api.section import SectionApi
+from compiler.api.compiler import Compiler
+from compiler.api.compile_result import CompileResult
+from compiler.benchmark.queries import measure_queries
+from compiler.models import Folder, File, SectionType
+
+STAGES = ["parse", "store", "enrich", "asm"]
+asm_separator = ";" + "-" * 56
+
+
+# deterministic C sources in the style of the SDCC fixtures: directives,
+# #ifdef blocks, globals, block and line comments, procedures with inline asm
+class SyntheticCorpus:
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.counter = 0
+
+    # whole blocks only, so the source may be a few lines longer than asked
+    def generate(self, lines):
+        blocks = [self.__header_comment, self.__directives, self.__ifdef,
+                  self.__globals, self.__procedure, self.__procedure]
+        source_code = []
+        while len(source_code) < lines:
+            self.counter += 1
+            source_code += self.random.choice(blocks)()
+        return source_code
+
+    # an sdcc listing of the source: a ";\tsource.c: N: ..." comment before
+    # the instructions of every line of code
+    def get_asm(self, source_code):
+        file_name = Compiler.file_name + Compiler.file_ext
+        asm = [asm_separator, "; File Created by SDCC", asm_separator,
+               "\t.module " + Compiler.file_name, "\t.optsdcc -mmcs51",
+               asm_separator, "; code", asm_separator]
+        for counter, line in enumerate(source_code, start=1):
+            stripped = line.strip()
+            if not stripped or stripped[0] in "#/*":
+                continue
+            if line.endswith(")") and not line.startswith(" "):
+                asm += [f";\t{file_name}: {counter}: {stripped}", ";\t" + "-" * 41,
+                        f";\t function proc_{counter}", ";\t" + "-" * 41, f"_proc_{counter}:"]
+            else:
+                asm += [f";\t{file_name}: {counter}: {stripped}", "\tmov\ta,r7", "\tadd\ta,#0x01"]
+        return asm
+
+    def __header_comment(self):
+        return ["/*", f" * Block {self.counter} of the synthetic firmware",
+                " * Register definitions, still incomplete.", " */"]
+
+    def __directives(self):
+        lines = ["#include <stdint.h>"]
+        for pin in range(self.random.randint(2, 8)):
+            lines.append(f"#define PIN{self.counter}_{pin}    (1 << {pin})")
+        return lines + [""]
+
+    def __ifdef(self):
+        return [f"#ifndef _BLOCK_{self.counter}_H", f"#define _BLOCK_{self.counter}_H",
+                f"#define PD_ODR_{self.counter} *(volatile unsigned char *)0x500F",
+                "#else", f"#define PD_ODR_{self.counter} 0", "#endif"]
+
+    def __globals(self):
+        lines = ["// state shared with the interrupts"]
+        for variable in range(self.random.randint(1, 4)):
+            lines.append(f"volatile uint8_t counter_{self.counter}_{variable} = 0;")
+        return lines
+
+    def __procedure(self):
+        lines = [f"void proc_{self.counter}(uint8_t value)", "{",
+                 "    uint8_t i;", "    // toggle every pin up to value",
+                 "    for (i = 0; i < value; i++) {",
+                 f"        PD_ODR_{self.counter} ^= (1 << i);", "    }"]
+        if self.random.random() < 0.3:
+            lines += ["    __asm", "    nop", "    nop", "    __endasm;"]
+        if self.random.random() < 0.3:
+            lines += ["    /* brackets in literals are not code: '}' */",
+                      "    if (value == '}') {", "        puts(\"{\");", "    }"]
+        return lines + ["}", ""]
+
+
+# measures every stage of sectioning a synthetic source: lines/s, peak
+# memory and SQL queries; the database changes are rolled back
+class ParseBenchmark:
+
+    def __init__(self, lines, seed=0):
+        corpus = SyntheticCorpus(seed)
+        self.source_code = corpus.generate(lines)
+        self.asm = corpus.get_asm(self.source_code)
+
+    def run(self):
+        results = {}
+        with transaction.atomic():
+            file = self.__create_file()
+            section_api = SectionApi(file.id)
+            sections = Parser(self.source_code, 0).parse_source_code()
+            lines = len(self.source_code)
+            stages = {
+                "parse": (lambda: Parser(self.source_code, 0).parse_source_code(), lines),
+                "store": (lambda: section_api.replace(sections), lines),
+                "enrich": (lambda: section_api.get_source_code_enriched(self.source_code), lines),
+                "asm": (self.__enrich_asm, len(self.asm))
+            }
+            for stage in STAGES:
+                results[stage] = self.__measure(*stages[stage])
+            transaction.set_rollback(True)
+        return results
+
+    # stages whose lines/s dropped more than tolerance below the baseline
+    @staticmethod
+    def compare(results, baseline, tolerance):
+        regressions = []
+        for stage, result in results.items():
+            if stage not in baseline:
+                continue
+            ratio = result["lines_per_second"] / baseline[stage]["lines_per_second"]
+            if ratio < 1 - tolerance:
+                regressions.append((stage, ratio))
+        return regressions
+
+    def __create_file(self):
+        for name in [DIRECTIVE, VARIABLE, PROCEDURE, COMMENT, ASSEMBLY]:
+            SectionType.objects.get_or_create(name=name)
+        user = User.objects.create(username="parse_benchmark")
+        folder = Folder.objects.create(name="parse_benchmark", user=user)
+        return File.objects.create(name="parse_benchmark.c", user=user, folder=folder,
+                                   source_code="\n".join(self.source_code))
+
+    def __enrich_asm(self):
+        compiler = Compiler("parse_benchmark")
+        compiler.result = CompileResult(0, b"", "\n".join(self.asm))
+        return compiler.get_asm()
+
+    # time and queries of one run, peak memory of a second, traced one
+    def __measure(self, stage, lines):
+        measured = measure_queries(stage)
+
+        tracemalloc.start()
+        try:
+            stage()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "lines": lines,
+            "seconds": measured["time"],
+            "lines_per_second": lines / measured["time"],
+            "peak_memory": peak,
+            "queries": measured["queries"]
+        }
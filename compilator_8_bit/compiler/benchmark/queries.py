@@ -0,0 +1,17 @@
+import time
+from django.db import connection
+
+
+# result, time and number of SQL queries of one call
+def measure_queries(call):
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        data = call()
+        elapsed = time.perf_counter() - start
+    return {"data": data, "queries": len(queries), "time": elapsed}
@@ -0,0 +1,73 @@
+import json
+import tempfile
+from pathlib import Path
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from compiler.benchmark.parse_benchmark import ParseBenchmark, STAGES
+
+
+class Command(BaseCommand):
+    help = ("Measures parsing, storing and enriching sections of a synthetic SDCC source, "
+            "on a temporary SQLite database")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 100000],
+                            help="sizes of the generated sources")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="seed of the generated sources")
+        parser.add_argument("--output", default=None,
+                            help="JSON file the results are saved to, e.g. as a new baseline")
+        parser.add_argument("--baseline", default=None,
+                            help="JSON file saved by --output to compare the results with")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="fraction of lines/s a stage may lose against the baseline")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The benchmark needs an SQLite database")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+
+        # the synthetic files are written to a database of their own, the
+        # configured one is neither changed nor locked meanwhile
+        name = connection.settings_dict["NAME"]
+        with tempfile.TemporaryDirectory() as directory:
+            self.__use_database(Path(directory, "benchmark.sqlite3"))
+            call_command("migrate", verbosity=0, interactive=False)
+            try:
+                results, regressions = self.__run(options, baseline)
+            finally:
+                self.__use_database(name)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+
+        if regressions:
+            raise CommandError("Slower than the baseline: " + "; ".join(regressions))
+
+    def __run(self, options, baseline):
+        results = {}
+        regressions = []
+        for lines in options["lines"]:
+            key = str(lines)
+            results[key] = ParseBenchmark(lines, options["seed"]).run()
+            self.stdout.write(f"{lines} lines")
+            for stage in STAGES:
+                result = results[key][stage]
+                self.stdout.write(f"  {stage:7s}{result['lines_per_second']:12.0f} lines/s"
+                                  f"{result['peak_memory'] / 1024:10.0f} KiB"
+                                  f"{result['queries']:6d} queries")
+            if baseline and key in baseline:
+                for stage, ratio in ParseBenchmark.compare(results[key], baseline[key], options["tolerance"]):
+                    regressions.append(f"{stage} at {lines} lines: {ratio:.0%} of the baseline")
+        return results, regressions
+
+    # the connection is opened again on name when next used
+    def __use_database(self, name):
+        connection.close()
+        connection.settings_dict["NAME"] = name
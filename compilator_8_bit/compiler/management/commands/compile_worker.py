@@ -0,0 +1,52 @@
+import time
+import signal
+import multiprocessing
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from compiler.api.compile_queue import CompileQueue
+
+
+def work(once):
+    compile_queue = CompileQueue()
+    while True:
+        job = compile_queue.run_next()
+        if job is None:
+            if once:
+                break
+            time.sleep(settings.COMPILE_QUEUE_POLL_INTERVAL)
+        else:
+            print(f"job {job.id}: {job.status}", flush=True)
+
+
+class Command(BaseCommand):
+    help = "Runs queued compile jobs in a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=settings.COMPILE_QUEUE_PROCESSES,
+                            help="number of jobs compiled at the same time")
+        parser.add_argument("--once", action="store_true",
+                            help="exit when the queue is empty")
+
+    def handle(self, *args, **options):
+        processes = max(1, options["processes"])
+        # every child opens its own database connection
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=work, args=(options["once"],)) for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {processes} compile worker(s)")
+        # stopped by the service manager as by Ctrl-C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
+            # jobs the workers were compiling go back to the queue
+            recovered = CompileQueue().recover([CompileQueue.get_worker_name(worker.pid) for worker in workers])
+            self.stdout.write(f"Stopped, {recovered} job(s) queued again")
@@ -0,0 +1,31 @@
+import os
+from django.core.management.base import BaseCommand
+from compiler.api.parse_pool import ParsePool
+
+
+class Command(BaseCommand):
+    help = "Parses the sections of all enabled files, or of a folder subtree, in a pool of processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--folder", type=int, default=None,
+                            help="parse only this folder and its subfolders")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="number of parsing processes")
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="files written to the database in one transaction")
+        parser.add_argument("--force", action="store_true",
+                            help="parse files whose sections are up to date too")
+        parser.add_argument("--progress", action="store_true",
+                            help="report every written batch")
+
+    def handle(self, *args, **options):
+        parse_pool = ParsePool(options["workers"], options["batch_size"])
+        progress = None
+        if options["progress"]:
+            progress = lambda done, total: self.stdout.write(f"{done}/{total} files")
+
+        result = parse_pool.parse(parse_pool.get_files(options["folder"]), options["force"], progress)
+        for file_id, message in result["failed"]:
+            self.stderr.write(f"file {file_id}: {message}")
+        self.stdout.write(f"Parsed {result['parsed']} file(s), {result['skipped']} up to date, "
+                          f"{len(result['failed'])} failed")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from compiler.api.file import FileApi
+
+
+class Command(BaseCommand):
+    help = "Removes files deleted more than the given number of days ago, with the texts no other file uses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+
+    def handle(self, *args, **options):
+        removed = FileApi().purge(options["days"])
+        self.stdout.write(f"Removed {removed} file{'' if removed == 1 else 's'}")
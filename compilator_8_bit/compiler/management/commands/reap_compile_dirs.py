@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from compiler.api.compile_reaper import CompileReaper
+
+
+class Command(BaseCommand):
+    help = "Removes compilation directories abandoned by interrupted compiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=int, default=None,
+                            help="age in seconds, COMPILE_SANDBOX_MAX_AGE by default")
+
+    def handle(self, *args, **options):
+        removed = CompileReaper(options["max_age"]).reap()
+        self.stdout.write(f"Removed {removed} compilation director{'y' if removed == 1 else 'ies'}")
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('compiler', '0004_alter_section_status_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompileJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('standard', models.CharField(max_length=100)),
+                ('processor', models.CharField(max_length=100)),
+                ('optimizations', models.JSONField(default=list)),
+                ('dependent', models.JSONField(default=list)),
+                ('status', models.CharField(db_index=True, default='queued', max_length=10)),
+                ('uid', models.CharField(blank=True, max_length=100)),
+                ('compilation_status', models.CharField(blank=True, max_length=100)),
+                ('create_date', models.DateTimeField(auto_now_add=True)),
+                ('update_date', models.DateTimeField(auto_now=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='compiler.file')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
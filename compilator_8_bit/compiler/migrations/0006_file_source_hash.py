@@ -0,0 +1,31 @@
+import hashlib
+from django.db import migrations, models
+
+
+def set_source_hash(apps, schema_editor):
+    File = apps.get_model("compiler", "File")
+    files = list(File.objects.only("id", "source_code"))
+    for file in files:
+        file.source_hash = hashlib.sha256(file.source_code.encode("utf-8")).hexdigest()
+    File.objects.bulk_update(files, ["source_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0005_compilejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='source_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='parsed_hash',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(set_source_hash, migrations.RunPython.noop),
+    ]
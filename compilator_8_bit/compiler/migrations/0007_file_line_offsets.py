@@ -0,0 +1,29 @@
+from array import array
+from itertools import accumulate
+from django.db import migrations, models
+
+
+def set_line_offsets(apps, schema_editor):
+    File = apps.get_model("compiler", "File")
+    files = list(File.objects.only("id", "source_code"))
+    for file in files:
+        offsets = array("I", [0])
+        offsets.extend(accumulate(len(line) + 1 for line in file.source_code.split("\n")))
+        file.line_offsets = offsets.tobytes()
+    File.objects.bulk_update(files, ["line_offsets"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0006_file_source_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='line_offsets',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.RunPython(set_line_offsets, migrations.RunPython.noop),
+    ]
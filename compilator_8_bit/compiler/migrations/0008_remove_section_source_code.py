@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+# sections kept the repr of their list of lines, as SectionApi.create wrote it
+def load_section_text(apps, schema_editor):
+    Section = apps.get_model("compiler", "Section")
+    sections = list(Section.objects.select_related("file"))
+    lines = {}
+    for section in sections:
+        if section.file_id not in lines:
+            lines[section.file_id] = section.file.source_code.split("\n")
+        section.source_code = str(lines[section.file_id][section.start_line - 1:section.end_line])
+    Section.objects.bulk_update(sections, ["source_code"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0007_file_line_offsets'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, load_section_text),
+        # lets the column be added back to existing rows when unapplied
+        migrations.AlterField(
+            model_name='section',
+            name='source_code',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='section',
+            name='source_code',
+        ),
+    ]
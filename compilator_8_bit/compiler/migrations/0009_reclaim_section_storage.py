@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+# the rebuilt section table leaves the pages of the removed text free inside
+# the database file; VACUUM gives them back, outside of any transaction
+def vacuum(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("VACUUM")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('compiler', '0008_remove_section_source_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(vacuum, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+import zlib
+import hashlib
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def store_blobs(apps, schema_editor):
+    File = apps.get_model("compiler", "File")
+    SourceBlob = apps.get_model("compiler", "SourceBlob")
+    files = list(File.objects.only("id", "source_code"))
+    blobs = {}
+    for file in files:
+        file.blob_id = hashlib.sha256(file.source_code.encode("utf-8")).hexdigest()
+        if file.blob_id not in blobs:
+            data = file.source_code.encode("utf-8")
+            blob = SourceBlob(hash=file.blob_id, data=data, size=len(data))
+            if settings.SOURCE_BLOB_COMPRESS_LEVEL:
+                packed = zlib.compress(data, settings.SOURCE_BLOB_COMPRESS_LEVEL)
+                if len(packed) < len(data):
+                    blob.data, blob.compressed = packed, True
+            blobs[file.blob_id] = blob
+        blobs[file.blob_id].ref_count += 1
+    SourceBlob.objects.bulk_create(blobs.values(), batch_size=500)
+    File.objects.bulk_update(files, ["blob"], batch_size=500)
+
+
+def load_blobs(apps, schema_editor):
+    File = apps.get_model("compiler", "File")
+    files = list(File.objects.select_related("blob"))
+    for file in files:
+        data = bytes(file.blob.data)
+        file.source_code = zlib.decompress(data).decode("utf-8") if file.blob.compressed else data.decode("utf-8")
+        file.source_hash = file.blob_id
+    File.objects.bulk_update(files, ["source_code", "source_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0009_reclaim_section_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceBlob',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('compressed', models.BooleanField(default=False)),
+                ('size', models.IntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('create_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='compiler.sourceblob'),
+        ),
+        migrations.RunPython(store_blobs, load_blobs),
+        # lets the column be added back to existing rows when unapplied
+        migrations.AlterField(
+            model_name='file',
+            name='source_code',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='file',
+            name='source_code',
+        ),
+        migrations.RemoveField(
+            model_name='file',
+            name='source_hash',
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='compiler.sourceblob'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0010_sourceblob'),
+    ]
+
+    operations = [
+        # composite indexes first, the single column ones they replace after
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['folder', 'enabled'], name='file_folder_enabled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['parent_id', 'enabled'], name='folder_parent_enabled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['file', 'start_line', 'end_line'], name='section_file_lines_idx'),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='folder',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='compiler.folder'),
+        ),
+        migrations.AlterField(
+            model_name='folder',
+            name='parent_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='section',
+            name='file',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='compiler.file'),
+        ),
+    ]
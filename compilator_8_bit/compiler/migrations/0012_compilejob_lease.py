@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0011_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compilejob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='start_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='compilejob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
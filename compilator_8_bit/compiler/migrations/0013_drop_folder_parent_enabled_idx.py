@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compiler', '0012_compilejob_lease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='folder',
+            name='folder_parent_enabled_idx',
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+import zlib
+import hashlib
+from array import array
+from itertools import accumulate
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.contrib.auth.models import User
 
 
@@ -10,12 +16,66 @@ class Folder(models.Model):
     enabled = models.BooleanField(null=False, default=True)
     enable_update_date = models.DateTimeField(null=True)
     update_date = models.DateTimeField(auto_now=True)
-    parent_id = models.IntegerField(null=True, db_index=True)
+    parent_id = models.IntegerField(null=True)
 
     def __str__(self):
         return f"{self.id} {self.name} (parent_id {self.parent_id})"
 
 
+# text of files, stored once however many files share it
+class SourceBlob(models.Model):
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    compressed = models.BooleanField(default=False)
+    # length of the text in bytes, before compression
+    size = models.IntegerField(default=0)
+    # number of File rows pointing to the blob, soft deleted ones included
+    ref_count = models.IntegerField(default=0)
+    create_date = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def get_hash(source_code):
+        return hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+
+    def get_source_code(self):
+        data = bytes(self.data)
+        if self.compressed:
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    # takes one more reference to the blob of the hash, storing the text
+    # when no file used it yet
+    @classmethod
+    def acquire(cls, source_hash, source_code):
+        with transaction.atomic():
+            if cls.objects.filter(pk=source_hash).update(ref_count=F("ref_count") + 1):
+                return
+            data = source_code.encode("utf-8")
+            size = len(data)
+            compressed = False
+            if settings.SOURCE_BLOB_COMPRESS_LEVEL:
+                packed = zlib.compress(data, settings.SOURCE_BLOB_COMPRESS_LEVEL)
+                if len(packed) < size:
+                    data, compressed = packed, True
+            try:
+                with transaction.atomic():
+                    cls.objects.create(hash=source_hash, data=data, compressed=compressed,
+                                       size=size, ref_count=1)
+            except IntegrityError:
+                # stored meanwhile by another request
+                cls.objects.filter(pk=source_hash).update(ref_count=F("ref_count") + 1)
+
+    # drops one reference, the blob goes with the last one
+    @classmethod
+    def release(cls, source_hash):
+        with transaction.atomic():
+            cls.objects.filter(pk=source_hash).update(ref_count=F("ref_count") - 1)
+            cls.objects.filter(pk=source_hash, ref_count__lte=0).delete()
+
+    def __str__(self):
+        return f"{self.hash} ({self.size} bytes, {self.ref_count} references)"
+
+
 class File(models.Model):
     name = models.CharField(max_length=100)
     description = models.CharField(max_length=1000, blank=True)
@@ -24,8 +84,95 @@ class File(models.Model):
     enabled = models.BooleanField(null=False, default=True)
     enable_update_date = models.DateTimeField(null=True)
     update_date = models.DateTimeField(auto_now=True)
-    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, db_index=True)
-    source_code = models.TextField()
+    folder = models.ForeignKey(Folder, on_delete=models.CASCADE, db_index=False)
+    blob = models.ForeignKey(SourceBlob, on_delete=models.PROTECT)
+    # parser version and source_hash the sections were parsed from, empty
+    # once the sections are edited by hand
+    parsed_hash = models.CharField(max_length=100, blank=True)
+    # packed array("I") of the offset in source_code of every line start,
+    # ending with the length of source_code plus one
+    line_offsets = models.BinaryField(blank=True, default=b"")
+    # source_code the line_offsets were computed for
+    offsets_source = None
+    # text read from the blob or set since, and whether save() has to store it
+    source_text = None
+    source_changed = False
+
+    # ParsePool lists the enabled files of each folder it parses
+    class Meta:
+        indexes = [models.Index(fields=["folder", "enabled"], name="file_folder_enabled_idx")]
+
+    # hash of the text, the key of its blob and of the parse and compile caches
+    @property
+    def source_hash(self):
+        return self.blob_id
+
+    # read from the blob on first use only, listing files does not load it
+    @property
+    def source_code(self):
+        if self.source_text is None:
+            self.source_text = self.blob.get_source_code() if self.blob_id else ""
+        return self.source_text
+
+    @source_code.setter
+    def source_code(self, source_code):
+        self.source_text = source_code
+        self.source_changed = True
+
+    @staticmethod
+    def get_line_offsets(source_code):
+        offsets = array("I", [0])
+        offsets.extend(accumulate(len(line) + 1 for line in source_code.split("\n")))
+        return offsets.tobytes()
+
+    # replaces the text with its line offsets known already, save() does not
+    # compute them again
+    def set_source_code(self, source_code, line_offsets):
+        self.source_code = source_code
+        self.line_offsets = line_offsets
+        self.offsets_source = source_code
+
+    # the blob is switched only when the text was set, saving other fields
+    # of a stored file does not read it; a new row, copies included, takes
+    # a reference of its own
+    def save(self, *args, **kwargs):
+        # a new file given no text stores "", as source_code defaulted to
+        if self.blob_id is None and self.source_text is None:
+            self.source_code = ""
+        if not self.source_changed and self.pk is not None:
+            super().save(*args, **kwargs)
+            return
+
+        source_hash = self.blob_id
+        if self.source_changed:
+            if self.offsets_source is not self.source_text:
+                self.line_offsets = self.get_line_offsets(self.source_text)
+                self.offsets_source = self.source_text
+            source_hash = SourceBlob.get_hash(self.source_text)
+        with transaction.atomic():
+            # a write comes first: on SQLite in WAL mode a transaction that
+            # read before its first write fails at once with "database is
+            # locked" when another connection committed in between
+            SourceBlob.acquire(source_hash, self.source_text)
+            # the row may point to another blob than this instance was read
+            # with; releasing it drops the extra reference taken above when
+            # the text did not change
+            old_hash = None
+            if self.pk is not None:
+                old_hash = File.objects.select_for_update().filter(pk=self.pk).values_list("blob_id", flat=True).first()
+            self.blob_id = source_hash
+            super().save(*args, **kwargs)
+            if old_hash is not None:
+                SourceBlob.release(old_hash)
+        self.source_changed = False
+
+    # a row read again may point to another blob, its text is read on next use
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        if fields is None or "blob" in fields or "blob_id" in fields:
+            self.source_text = None
+            self.source_changed = False
+            self.offsets_source = None
 
     def __str__(self):
         return f"{self.id} {self.name} (folder {self.folder})"
@@ -40,13 +187,42 @@ class Section(models.Model):
     name = models.CharField(max_length=100, blank=True)
     description = models.CharField(max_length=1000, blank=True)
     create_date = models.DateTimeField(auto_now_add=True)
-    file = models.ForeignKey(File, on_delete=models.CASCADE, db_index=True)
+    file = models.ForeignKey(File, on_delete=models.CASCADE, db_index=False)
     start_line = models.IntegerField(null=False)
     end_line = models.IntegerField(null=False)
     section_type = models.ForeignKey(SectionType, on_delete=models.CASCADE, db_index=True)
     section_status = models.ForeignKey(SectionStatus, on_delete=models.CASCADE, db_index=True, null=True)
     status_data = models.TextField()
-    source_code = models.TextField()
+
+    # sections are read, shifted and checked for overlaps by file and line
+    # range, most of them from the index alone
+    class Meta:
+        indexes = [models.Index(fields=["file", "start_line", "end_line"], name="section_file_lines_idx")]
 
     def __str__(self):
         return f"{self.id}, file: {self.file.name}, {self.file.id} (lines {self.start_line} - {self.end_line}), {self.section_type.name}"
+
+class CompileJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    file = models.ForeignKey(File, on_delete=models.CASCADE, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    standard = models.CharField(max_length=100)
+    processor = models.CharField(max_length=100)
+    optimizations = models.JSONField(default=list)
+    dependent = models.JSONField(default=list)
+    status = models.CharField(max_length=10, default=QUEUED, db_index=True)
+    uid = models.CharField(max_length=100, blank=True)
+    compilation_status = models.CharField(max_length=100, blank=True)
+    create_date = models.DateTimeField(auto_now_add=True)
+    update_date = models.DateTimeField(auto_now=True)
+    # when and by which process the job was last claimed, and how many times
+    start_date = models.DateTimeField(null=True)
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.id} file {self.file_id} ({self.status})"
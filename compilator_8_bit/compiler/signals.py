@@ -0,0 +1,27 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from compiler.models import Folder, File, SourceBlob
+from compiler.api.folder_tree import FolderTreeCache
+from compiler.sqlite import set_pragmas
+
+
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+def invalidate_folder_tree(sender, **kwargs):
+    FolderTreeCache.bump_version()
+
+
+# also for files removed by a queryset or with their folder or user
+@receiver(post_delete, sender=File)
+def release_source_blob(sender, instance, **kwargs):
+    SourceBlob.release(instance.blob_id)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            set_pragmas(cursor)
@@ -0,0 +1,9 @@
+from django.conf import settings
+
+
+# pragmas of settings.SQLITE_PRAGMAS, or the given ones, on a DB-API cursor
+def set_pragmas(cursor, pragmas=None):
+    if pragmas is None:
+        pragmas = settings.SQLITE_PRAGMAS
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
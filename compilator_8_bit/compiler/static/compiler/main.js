@@ -1,4 +1,7 @@
 let prev_folder;
+let lineIndex;
+let asmLines;
+let asmLineNumbers;
 
 function start() {
     let i;
@@ -103,7 +106,12 @@ function loadFile(url) {
 
 function fileOnLoad() {
     const targetId = this.status === 200 ? "middle_place" : "code"
-    document.getElementById(targetId).innerHTML = this.responseText;
+    showCode(targetId, this.responseText);
+}
+
+function showCode(targetId, html) {
+    let i;
+    document.getElementById(targetId).innerHTML = html;
 
     const sectionsOuter = document.getElementsByClassName("code-section-outer");
     const sectionsInner = document.getElementsByClassName("code-section-inner");
@@ -382,25 +390,102 @@ function submitCompile(event) {
     const form = document.getElementById("compiler_form");
     const xhttp = new XMLHttpRequest();
     xhttp.onload = function() {
-        fileOnLoad.bind(this)();
-        fireFragmentEventListeners();
+        if (this.status !== 200) {
+            fileOnLoad.bind(this)();
+            return;
+        }
+        const {job_id} = JSON.parse(this.response);
+        pollCompileJob(job_id);
     };
     xhttp.open(form.method, form.action, true);
     xhttp.send(new FormData(form));
 }
 
+function pollCompileJob(jobId) {
+    const xhttp = new XMLHttpRequest();
+    xhttp.onload = function() {
+        if (this.status !== 200) {
+            fileOnLoad.bind(this)();
+            return;
+        }
+        const {status, html} = JSON.parse(this.response);
+        switch (status) {
+            case "queued":
+            case "running":
+                pollCompileJob(jobId);
+                break;
+            case "done":
+                showCode("middle_place", html);
+                fireFragmentEventListeners();
+                break;
+            default:
+                alert("Compilation failed!");
+        }
+    };
+    // long poll, the server answers as soon as the job finishes
+    xhttp.open("GET", `/compile/jobs/${jobId}?wait=20`, true);
+    xhttp.send();
+}
+
 function fireFragmentEventListeners() {
+    let i;
+    const asmToggler = document.getElementsByClassName("asm-header");
+    for (i = 0; i < asmToggler.length; i++) {
+        asmToggler[i].addEventListener("click", toggleAsmBody, false);
+    }
+
+    loadLineIndex();
+}
+
+function addSourceReferListeners() {
     let i;
     const sourceLineRefer = document.getElementsByClassName("source-refer");
     for (i = 0; i < sourceLineRefer.length; i++) {
         sourceLineRefer[i].addEventListener("mousedown", toggleSourceCodeLine, false);
         sourceLineRefer[i].addEventListener("mouseup", toggleSourceCodeLine, false);
     }
+}
 
-    const asmToggler = document.getElementsByClassName("asm-header");
-    for (i = 0; i < asmToggler.length; i++) {
-        asmToggler[i].addEventListener("click", toggleAsmBody, false);
+// one listener for the whole listing; lines are looked up in the index of
+// the compilation instead of being searched in the DOM
+function loadLineIndex() {
+    const asm = document.getElementById("compiled_code");
+    const uid = document.getElementById("compiled_uid")?.value;
+    if (! asm || ! uid) {
+        return;
+    }
+
+    const xhttp = new XMLHttpRequest();
+    xhttp.onload = function() {
+        if (this.status !== 200) {
+            addSourceReferListeners();
+            return;
+        }
+        lineIndex = JSON.parse(this.response);
+        asmLines = Array.from(asm.getElementsByClassName("code"));
+        asmLineNumbers = new Map(asmLines.map((line, i) => [line, i + 1]));
+        asm.addEventListener("mousedown", toggleAsmLines, false);
+        asm.addEventListener("mouseup", toggleAsmLines, false);
+    };
+    xhttp.open("GET", `/compile/${uid}/line-index`, true);
+    xhttp.send();
+}
+
+function toggleAsmLines(event) {
+    const line = asmLineNumbers.get(event.target.closest(".code"));
+    const sourceLine = line && lineIndex.asm_to_source[line - 1];
+    if (! sourceLine) {
+        return;
     }
+
+    for (const [start, end] of lineIndex.source_to_asm[sourceLine]) {
+        for (let number = start; number <= end; number++) {
+            asmLines[number - 1].classList.toggle("caret-red-bold");
+        }
+    }
+    const targetId = `source_line_${sourceLine}`
+    document.getElementById(targetId).classList.toggle("caret-red-bold");
+    document.location.href = `#${targetId}`;
 }
 
 function runDownloader(event) {
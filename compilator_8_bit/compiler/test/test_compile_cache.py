@@ -0,0 +1,163 @@
+import os
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from compiler.api.compile_cache import CompileCache
+from compiler.api.compile_result import CompileResult
+from compiler.api.compiler import Compiler
+from compiler.api.file import FileApi
+
+class CompileCacheTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.compile_cache = CompileCache(self.directory.name, 1024 * 1024)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_key(self):
+        key = CompileCache.get_key("int main(void) {}", ["--std-c11", "-mstm8"])
+        self.assertEqual(len(key), 64)
+        self.assertEqual(key, CompileCache.get_key("int main(void) {}", ["--std-c11", "-mstm8"]))
+        self.assertNotEqual(key, CompileCache.get_key("int main(void) {}", ["--std-c11", "-mz80"]))
+        self.assertNotEqual(key, CompileCache.get_key("int main(void) { }", ["--std-c11", "-mstm8"]))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.compile_cache.get("0" * 64))
+
+    def test_put_get(self):
+        data = [{"line_id": "3", "line_content": "3: warning 85"}]
+        result = CompileResult(0, b"source.c:3: warning 85", "asm body")
+        self.compile_cache.put("a" * 64, result, "Compiled with warnings", data)
+        cached = self.compile_cache.get("a" * 64)
+        self.assertEqual(cached["result"].returncode, 0)
+        self.assertEqual(cached["result"].stderr, b"source.c:3: warning 85")
+        self.assertEqual(cached["result"].asm, "asm body")
+        self.assertEqual(cached["status"], "Compiled with warnings")
+        self.assertEqual(cached["data"], data)
+
+    # failed compilation has no asm, it is cached as None
+    def test_put_get_no_asm(self):
+        result = CompileResult(1, b"source.c:1: error 1", None)
+        self.compile_cache.put("b" * 64, result, "Does not compile", [])
+        cached = self.compile_cache.get("b" * 64)
+        self.assertIsNone(cached["result"].asm)
+        self.assertEqual(cached["status"], "Does not compile")
+
+    def test_put_get_line_index(self):
+        line_index = {"source_to_asm": {"2": [[3, 4]]}, "asm_to_source": [0, 0, 2, 2]}
+        result = CompileResult(0, b"", "asm body")
+        self.compile_cache.put("c" * 64, result, "Compiled without warnings", [], line_index)
+        self.assertEqual(self.compile_cache.get_line_index("c" * 64), line_index)
+        self.assertNotIn("line_index", self.compile_cache.get("c" * 64))
+
+        self.compile_cache.put("d" * 64, result, "Compiled without warnings", [])
+        self.assertIsNone(self.compile_cache.get_line_index("d" * 64))
+        self.assertIsNone(self.compile_cache.get_line_index("../" + "c" * 61))
+
+    # ids coming from the client must not reach outside the cache directory
+    def test_get_wrong_key(self):
+        self.assertIsNone(self.compile_cache.get("../" + "a" * 61))
+        self.assertIsNone(self.compile_cache.get(None))
+
+    # least recently used entry is dropped once the size limit is exceeded
+    def test_evict(self):
+        compile_cache = CompileCache(self.directory.name, 2500)
+        compile_cache.put("a" * 64, CompileResult(0, b"", "x" * 1000), "Compiled without warnings", [])
+        compile_cache.put("b" * 64, CompileResult(0, b"", "x" * 1000), "Compiled without warnings", [])
+        os.utime(os.path.join(self.directory.name, "a" * 64), (0, 0))
+        os.utime(os.path.join(self.directory.name, "b" * 64), (1, 1))
+        compile_cache.get("a" * 64)
+        compile_cache.put("c" * 64, CompileResult(0, b"", "x" * 1000), "Compiled without warnings", [])
+
+        self.assertIsNotNone(compile_cache.get("a" * 64))
+        self.assertIsNone(compile_cache.get("b" * 64))
+        self.assertIsNotNone(compile_cache.get("c" * 64))
+
+    # failures kept aside neither count towards the size limit nor outlive
+    # their timeout
+    def test_put_failed(self):
+        compile_cache = CompileCache(self.directory.name, 1500)
+        key = compile_cache.put_failed(CompileResult(None, b"x" * 1000, None), "Does not compile", [])
+        compile_cache.put("a" * 64, CompileResult(0, b"", "x" * 1000), "Compiled without warnings", [])
+        self.assertEqual(compile_cache.get(key)["status"], "Does not compile")
+        self.assertIsNotNone(compile_cache.get("a" * 64))
+        self.assertEqual(sorted(os.listdir(self.directory.name)), [".failed", "a" * 64])
+
+        os.utime(os.path.join(self.directory.name, ".failed", key), (0, 0))
+        compile_cache.expire_failed()
+        self.assertIsNone(compile_cache.get(key))
+
+class CompilerCacheTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json"]
+    file_id = 1
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sandbox = tempfile.TemporaryDirectory()
+        self.settings = override_settings(COMPILE_CACHE_DIR=self.directory.name,
+                                          COMPILE_SANDBOX_DIR=self.sandbox.name)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.sandbox.cleanup()
+        self.directory.cleanup()
+
+    # cached result is returned without starting sdcc
+    def test_compile_cached(self):
+        source_hash = FileApi().get(self.file_id).source_hash
+        key = CompileCache.get_key(source_hash, ["--std-c11", "-mstm8", "--nooverlay", "--opt-code-size"])
+        data = [{"line_id": "2", "line_content": "2: warning 85"}]
+        result = CompileResult(0, b"source.c:2: warning 85", "asm body")
+        CompileCache().put(key, result, "Compiled with warnings", data)
+
+        compiler = Compiler(self.file_id, "c11", "stm8", ["opt-code-size", "nooverlay", "nooverlay"], [])
+        with mock.patch("compiler.api.compiler.subprocess.run") as run:
+            compiler.compile()
+            run.assert_not_called()
+        self.assertEqual(compiler.get_compilation_statuses(), ("Compiled with warnings", data))
+
+        result, asm_code = Compiler(compiler.uid).get_asm()
+        self.assertTrue(result)
+        self.assertEqual(asm_code[0].code, "asm body")
+
+    # sdcc that could not be started leaves nothing under the key of the source
+    def test_compile_not_run(self):
+        compiler = Compiler(self.file_id, "c11", "stm8", [], [])
+        with mock.patch("compiler.api.compiler.subprocess.run", side_effect=FileNotFoundError(2, "No such file or directory")):
+            uid = compiler.compile()
+        self.assertEqual(os.listdir(self.directory.name), [".failed"])
+        self.assertEqual(compiler.get_compilation_statuses(), ("Does not compile", []))
+        result, error_code = Compiler(uid).get_asm()
+        self.assertFalse(result)
+        self.assertEqual(error_code[0]["line_content"], "sdcc: No such file or directory")
+
+    # the line index is computed with the compilation and read back with it
+    def test_compile_line_index(self):
+        asm = ";--------------------------------------------------------\n; code\n" \
+              ";--------------------------------------------------------\n;\tsource.c: 1: int x;\n\tnop\n"
+        compiler = Compiler(self.file_id, "c11", "stm8", [], [])
+        with mock.patch.object(Compiler, "compile_source",
+                               lambda compiler, source_code: setattr(compiler, "result", CompileResult(0, b"", asm))):
+            uid = compiler.compile()
+        line_index = {"source_to_asm": {"1": [[4, 6]]}, "asm_to_source": [0, 0, 0, 1, 1, 1]}
+        self.assertEqual(compiler.get_line_index(), line_index)
+        self.assertEqual(Compiler(uid).get_line_index(), line_index)
+        self.assertEqual(CompileCache().get_line_index(uid), line_index)
+
+    # the listing of a fresh compilation is enriched once, for the index and
+    # for the page
+    def test_compile_enriched_once(self):
+        asm = ";--------------------------------------------------------\n; code\n" \
+              ";--------------------------------------------------------\n;\tsource.c: 1: int x;\n\tnop\n"
+        compiler = Compiler(self.file_id, "c11", "stm8", [], [])
+        enrich_asm = Compiler._Compiler__enrich_asm
+        with mock.patch.object(Compiler, "compile_source",
+                               lambda compiler, source_code: setattr(compiler, "result", CompileResult(0, b"", asm))), \
+                mock.patch.object(Compiler, "_Compiler__enrich_asm", autospec=True, side_effect=enrich_asm) as enrich:
+            compiler.compile()
+            result, asm_code = compiler.get_asm()
+        self.assertEqual(enrich.call_count, 1)
+        self.assertEqual(len(asm_code), 6)
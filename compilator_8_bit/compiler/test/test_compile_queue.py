@@ -0,0 +1,160 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth.models import User
+from compiler.api.compile_cache import CompileCache
+from compiler.api.compile_queue import CompileQueue
+from compiler.api.compile_result import CompileResult
+from compiler.api.file import FileApi
+from compiler.api.section import SectionApi
+from compiler.models import CompileJob
+
+class CompileQueueTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json", "file_timer.json",
+                "section.json", "section_type.json", "section_status.json"]
+    file_id = 1
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sandbox = tempfile.TemporaryDirectory()
+        self.settings = override_settings(COMPILE_CACHE_DIR=self.directory.name,
+                                          COMPILE_SANDBOX_DIR=self.sandbox.name)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.sandbox.cleanup()
+        self.directory.cleanup()
+
+    def test_enqueue(self):
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        job = compile_queue.get(job_id)
+        self.assertEqual(job.status, CompileJob.QUEUED)
+        self.assertEqual(job.file_id, self.file_id)
+
+    # jobs are left to compile_worker, the web process starts no threads
+    @mock.patch("compiler.api.compile_queue._executor", None)
+    def test_enqueue_no_workers(self):
+        with mock.patch("compiler.api.compile_queue.ThreadPoolExecutor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                CompileQueue().enqueue(self.__get_data())
+        executor.assert_not_called()
+
+    @override_settings(COMPILE_QUEUE_WORKERS=2)
+    @mock.patch("compiler.api.compile_queue._executor", None)
+    def test_enqueue_workers(self):
+        compile_queue = CompileQueue()
+        with mock.patch("compiler.api.compile_queue.ThreadPoolExecutor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                compile_queue.enqueue(self.__get_data())
+        executor.assert_called_once_with(max_workers=2, thread_name_prefix="compile")
+        executor.return_value.submit.assert_called_once_with(compile_queue.drain)
+
+    @override_settings(COMPILE_QUEUE_MAX_QUEUED=1)
+    def test_enqueue_full(self):
+        compile_queue = CompileQueue()
+        compile_queue.enqueue(self.__get_data())
+        self.assertRaisesMessage(ValueError, "Compile queue is full.", compile_queue.enqueue, self.__get_data())
+
+    # jobs are claimed in order and only once
+    def test_claim(self):
+        compile_queue = CompileQueue()
+        first = compile_queue.enqueue(self.__get_data())
+        second = compile_queue.enqueue(self.__get_data())
+        self.assertEqual(compile_queue.claim().id, first)
+        self.assertEqual(compile_queue.claim().id, second)
+        self.assertIsNone(compile_queue.claim())
+        self.assertEqual(compile_queue.get(first).status, CompileJob.RUNNING)
+
+    def test_claim_lease(self):
+        compile_queue = CompileQueue()
+        compile_queue.enqueue(self.__get_data())
+        job = compile_queue.claim()
+        job.refresh_from_db()
+        self.assertIsNotNone(job.start_date)
+        self.assertEqual(job.worker, CompileQueue.get_worker_name())
+        self.assertEqual(job.attempts, 1)
+
+    # a job left running by a process that died is claimed again, and failed
+    # once it used up its attempts
+    @override_settings(COMPILE_QUEUE_MAX_ATTEMPTS=2)
+    def test_claim_abandoned(self):
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        compile_queue.claim()
+        self.assertIsNone(compile_queue.claim())
+
+        self.__abandon(job_id)
+        job = compile_queue.claim()
+        self.assertEqual(job.id, job_id)
+        self.assertEqual(job.attempts, 2)
+
+        self.__abandon(job_id)
+        self.assertIsNone(compile_queue.claim())
+        self.assertEqual(compile_queue.get(job_id).status, CompileJob.FAILED)
+
+    def test_recover_workers(self):
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        compile_queue.claim()
+        self.assertEqual(compile_queue.recover(["other:1"]), 0)
+        self.assertEqual(compile_queue.recover([CompileQueue.get_worker_name()]), 1)
+        job = compile_queue.get(job_id)
+        self.assertEqual(job.status, CompileJob.QUEUED)
+        self.assertEqual(job.worker, "")
+
+    # polling a job whose process died does not wait for it forever
+    def test_wait_abandoned(self):
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        compile_queue.claim()
+        self.__abandon(job_id)
+        self.assertEqual(compile_queue.wait(job_id).status, CompileJob.QUEUED)
+
+    def test_get_other_user(self):
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        other = User.objects.create(username="other")
+        self.assertRaises(CompileJob.DoesNotExist, compile_queue.get, job_id, other)
+
+    # compiled from cache, so no sdcc is needed
+    def test_run_next(self):
+        source_hash = FileApi().get(self.file_id).source_hash
+        key = CompileCache.get_key(source_hash, ["--std-c11", "-mstm8"])
+        data = [{"line_id": "2", "line_content": "2: warning 85"}]
+        result = CompileResult(0, b"source.c:2: warning 85", "asm body")
+        CompileCache().put(key, result, "Compiled with warnings", data)
+
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        compile_queue.run_next()
+
+        job = compile_queue.wait(job_id)
+        self.assertEqual(job.status, CompileJob.DONE)
+        self.assertEqual(job.compilation_status, "Compiled with warnings")
+        self.assertNotEqual(job.uid, "")
+        sections = SectionApi(self.file_id).get().filter(section_status__name="Compiled with warnings")
+        self.assertEqual(len(sections), 1)
+
+    def test_run_next_failed(self):
+        compile_queue = CompileQueue()
+        job_id = compile_queue.enqueue(self.__get_data())
+        with mock.patch("compiler.api.compile_queue.Compiler", side_effect=OSError):
+            compile_queue.run_next()
+        self.assertEqual(compile_queue.get(job_id).status, CompileJob.FAILED)
+
+    def __abandon(self, job_id):
+        CompileJob.objects.filter(pk=job_id).update(
+            start_date=timezone.now() - timedelta(seconds=settings.COMPILE_QUEUE_JOB_TIMEOUT + 1))
+
+    def __get_data(self):
+        return {
+            "file_id": self.file_id,
+            "user": User.objects.get(pk=1),
+            "standard": "c11",
+            "processor": "stm8"
+        }
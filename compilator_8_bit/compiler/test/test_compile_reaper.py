@@ -0,0 +1,41 @@
+import os
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase, override_settings
+from compiler.api import compile_reaper
+from compiler.api.compile_reaper import CompileReaper
+
+class CompileReaperTest(SimpleTestCase):
+
+    # the throttle of schedule() is kept by the module, between tests too
+    def setUp(self):
+        compile_reaper._last_run = 0
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(COMPILE_SANDBOX_DIR=self.directory.name)
+        self.settings.enable()
+        self.compile_reaper = CompileReaper(60)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+        compile_reaper._last_run = 0
+
+    # only directories older than max_age are removed
+    def test_reap(self):
+        old = Path(self.directory.name, "old")
+        old.mkdir()
+        Path(old, "source.c").write_text("int main(void) {}")
+        os.utime(old, (0, 0))
+        Path(self.directory.name, "new").mkdir()
+
+        self.assertEqual(self.compile_reaper.reap(), 1)
+        self.assertEqual(os.listdir(self.directory.name), ["new"])
+
+    def test_reap_no_directory(self):
+        compile_reaper = CompileReaper(60, Path(self.directory.name, "missing"))
+        self.assertEqual(compile_reaper.reap(), 0)
+
+    @override_settings(COMPILE_REAPER_INTERVAL=3600)
+    def test_schedule_once_per_interval(self):
+        self.assertTrue(CompileReaper().schedule())
+        self.assertFalse(CompileReaper().schedule())
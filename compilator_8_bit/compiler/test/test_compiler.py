@@ -0,0 +1,95 @@
+from django.test import SimpleTestCase
+from compiler.api.compiler import Compiler
+from compiler.api.compile_result import CompileResult
+
+ASM = """;--------------------------------------------------------
+; File Created by SDCC
+;--------------------------------------------------------
+\t.module source
+;--------------------------------------------------------
+; code
+;--------------------------------------------------------
+;\tsource.c: 2: int x = 0;
+\tclr\ta"""
+
+class CompilerTest(SimpleTestCase):
+
+    def test_get_compilation_statuses(self):
+        compiler = self.__get_compiler(CompileResult(0, b"", ASM))
+        self.assertEqual(compiler.get_compilation_statuses(), ("Compiled without warnings", []))
+
+    def test_get_compilation_statuses_warnings(self):
+        stderr = b"source.c:2: warning 85: in function main unreferenced local variable\n"
+        compiler = self.__get_compiler(CompileResult(0, stderr, ASM))
+        status, data = compiler.get_compilation_statuses()
+        self.assertEqual(status, "Compiled with warnings")
+        self.assertEqual(data, [{
+            "line_id": "2",
+            "line_content": "2: warning 85: in function main unreferenced local variable\n"
+        }])
+
+    def test_get_compilation_statuses_error(self):
+        compiler = self.__get_compiler(CompileResult(1, b"source.c:3: syntax error: token -> '}'\n", None))
+        status, data = compiler.get_compilation_statuses()
+        self.assertEqual(status, "Does not compile")
+        self.assertEqual(data[0]["line_id"], "3")
+
+    # sdcc that could not be started is reported like a failed compilation
+    def test_get_compilation_statuses_not_run(self):
+        compiler = self.__get_compiler(CompileResult(None, b"sdcc: No such file or directory\n", None))
+        self.assertEqual(compiler.get_compilation_statuses(), ("Does not compile", []))
+
+    def test_get_asm(self):
+        compiler = self.__get_compiler(CompileResult(0, b"", ASM))
+        result, asm_code = compiler.get_asm()
+        self.assertTrue(result)
+        self.assertEqual(len(asm_code), 9)
+        self.assertEqual(asm_code[0].start_class, "asm-header")
+        self.assertEqual(asm_code[2].start_class, "asm-body")
+        self.assertEqual(asm_code[7].source_code_line, 2)
+
+    # only comments of the code blocks point to source lines
+    def test_get_asm_lines(self):
+        asm = ASM.replace("; File Created by SDCC", ";\tsource.c: 5: in the header")
+        compiler = self.__get_compiler(CompileResult(0, b"", asm))
+        result, asm_code = compiler.get_asm()
+        separator = ";" + "-" * 56
+        self.assertEqual([line.as_dict() for line in asm_code], [
+            {"code": separator, "start": True, "start_class": "asm-header", "position": "before", "source_code_line": 0},
+            {"code": ";\tsource.c: 5: in the header", "start": False, "source_code_line": 0},
+            {"code": separator, "start": True, "start_class": "asm-body", "position": "after", "source_code_line": 0},
+            {"code": "\t.module source", "start": False, "source_code_line": 0},
+            {"code": separator, "start": True, "start_class": "asm-header", "position": "before", "source_code_line": 0},
+            {"code": "; code", "start": False, "source_code_line": 0},
+            {"code": separator, "start": True, "start_class": "asm-body", "position": "after", "source_code_line": 0},
+            {"code": ";\tsource.c: 2: int x = 0;", "start": False, "source_code_line": 2},
+            {"code": "\tclr\ta", "start": False, "source_code_line": 0}
+        ])
+
+    # a source line owns the asm lines from its tag to the next tag or separator
+    def test_get_line_index(self):
+        asm = ASM + "\n\tret\n;\tsource.c: 3: x++;\n\tinc\tx\n;\tsource.c: 2: int x = 0;\n\tnop"
+        compiler = self.__get_compiler(CompileResult(0, b"", asm))
+        self.assertEqual(compiler.get_line_index(), {
+            "source_to_asm": {"2": [[8, 10], [13, 14]], "3": [[11, 12]]},
+            "asm_to_source": [0, 0, 0, 0, 0, 0, 0, 2, 2, 2, 3, 3, 2, 2]
+        })
+
+    def test_get_line_index_no_asm(self):
+        compiler = self.__get_compiler(CompileResult(1, b"source.c:3: syntax error\n", None))
+        self.assertIsNone(compiler.get_line_index())
+
+    def test_get_asm_error(self):
+        compiler = self.__get_compiler(CompileResult(1, b"source.c:3: syntax error\n", None))
+        result, error_code = compiler.get_asm()
+        self.assertFalse(result)
+        self.assertEqual(error_code[0], {"line_content": "source.c:3: syntax error", "source_code_line": 3})
+
+    def test_get_asm_not_found(self):
+        compiler = Compiler("0" * 64)
+        self.assertRaisesMessage(ValueError, "Compilation result not found!", compiler.get_asm)
+
+    def __get_compiler(self, result):
+        compiler = Compiler(1, "c11", "stm8", [], [])
+        compiler.result = result
+        return compiler
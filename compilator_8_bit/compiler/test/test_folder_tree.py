@@ -1,5 +1,10 @@
-from django.test import TestCase
-from compiler.api.folder_tree import FolderTree
+import tempfile
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from compiler.api.folder_tree import FolderTree, FolderTreeCache
+from compiler.api.folder import FolderApi
+from compiler.api.file import FileApi
 
 class FolderTreeTest(TestCase):
     fixtures = ["user.json", "folder.json", "file.json"]
@@ -23,4 +28,72 @@ class FolderTreeTest(TestCase):
                     {'id': 9, 'name': 'Blouses', 'is_file': False, 'children': [], 'has_children': False}], 'has_children': True}], 'has_children': True}]
 
         self.assertEqual(structure, expected)
-    
\ No newline at end of file
+    
+    # whole tree is loaded with one query for folders and one for files
+    def test_get_folder_structure_queries(self):
+        folder_tree = FolderTree()
+        with self.assertNumQueries(2):
+            folder_tree.get_folder_structure()
+
+    # disabled folders are skipped together with everything below them
+    def test_get_folder_structure_disabled(self):
+        FolderApi().delete(3)
+        folder_tree = FolderTree()
+        structure = folder_tree.get_folder_structure()
+
+        self.assertEqual([child['id'] for child in structure[0]['children']], [2])
+
+class FolderTreeCacheTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json"]
+    user_id = 1
+
+    def setUp(self):
+        cache.clear()
+
+    # second read is served from cache without touching the database
+    def test_get_folder_structure_cached(self):
+        folder_tree = FolderTreeCache(self.user_id)
+        structure = folder_tree.get_folder_structure()
+        with self.assertNumQueries(0):
+            cached = folder_tree.get_folder_structure()
+        self.assertEqual(cached, structure)
+        self.assertEqual(cached, FolderTree().get_folder_structure())
+
+    def test_invalidated_on_folder_create(self):
+        folder_tree = FolderTreeCache(self.user_id)
+        folder_tree.get_folder_structure()
+        FolderApi().create({
+            "parent_id": 0,
+            "name": "New_root",
+            "user": User.objects.get(pk=self.user_id)
+        })
+        structure = folder_tree.get_folder_structure()
+        self.assertEqual([root['name'] for root in structure], ["Clothing", "New_root"])
+
+    def test_invalidated_on_folder_delete(self):
+        folder_tree = FolderTreeCache(self.user_id)
+        folder_tree.get_folder_structure()
+        FolderApi().delete(1)
+        self.assertEqual(folder_tree.get_folder_structure(), [])
+
+    def test_invalidated_on_file_delete(self):
+        version = FolderTreeCache.get_version()
+        FileApi().delete(1)
+        self.assertGreater(FolderTreeCache.get_version(), version)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            caches = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory
+                }
+            }
+            with override_settings(CACHES=caches):
+                folder_tree = FolderTreeCache(self.user_id)
+                structure = folder_tree.get_folder_structure()
+                with self.assertNumQueries(0):
+                    self.assertEqual(folder_tree.get_folder_structure(), structure)
+                FolderApi().delete(2)
+                structure = folder_tree.get_folder_structure()
+                self.assertEqual([child['id'] for child in structure[0]['children']], [3])
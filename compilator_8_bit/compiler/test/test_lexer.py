@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+from compiler.api.lexer import Lexer
+
+class LexerTest(SimpleTestCase):
+
+    def test_scan(self):
+        lexer = Lexer()
+        self.assertEqual(lexer.scan("int main(void) {"), [1, 0, 1, 1])
+        self.assertEqual(lexer.scan("    if (x) { y(); }"), [1, 1, 2, 2])
+
+    # brackets in strings, char literals and comments are not code
+    def test_scan_not_code(self):
+        lexer = Lexer()
+        self.assertEqual(lexer.scan('    puts("}"); // }'), [0, 0, 1, 1])
+        self.assertEqual(lexer.scan("    c = '{'; c = '\\''; /* ( */"), [0, 0, 0, 0])
+        self.assertEqual(lexer.scan('    s = "\\"{";'), [0, 0, 0, 0])
+
+    def test_scan_block_comment(self):
+        lexer = Lexer()
+        lexer.scan("x = 1; /* {")
+        self.assertTrue(lexer.in_comment())
+        self.assertEqual(lexer.scan("   } ( */ }"), [0, 1, 0, 0])
+        self.assertTrue(lexer.started_in_comment)
+        self.assertFalse(lexer.in_comment())
+
+    # directives and the lines they go on to are not counted
+    def test_scan_directive(self):
+        lexer = Lexer()
+        self.assertEqual(lexer.scan("#define nop() {__asm__(\"nop\\n\");} \\"), [0, 0, 0, 0])
+        self.assertEqual(lexer.scan("    {}"), [0, 0, 0, 0])
+        self.assertTrue(lexer.continues_directive)
+        self.assertEqual(lexer.scan("{"), [1, 0, 0, 0])
+        self.assertFalse(lexer.continues_directive)
+
+    def test_scan_spliced(self):
+        lexer = Lexer()
+        lexer.scan('s = "{ \\')
+        self.assertEqual(lexer.scan('}"; }'), [0, 1, 0, 0])
+        lexer.scan("// comment \\")
+        self.assertEqual(lexer.scan("{"), [0, 0, 0, 0])
+        self.assertEqual(lexer.scan("{"), [1, 0, 0, 0])
@@ -1,4 +1,6 @@
 import json
+import base64
+import hashlib
 from pathlib import Path
 from django.test import TestCase
 from django.contrib.auth.models import User
@@ -43,6 +45,21 @@ class FileTest(TestCase):
         expected = tested_source_code[0:2] + tested_source_code[5:]
         self.assertEqual(source_code, expected)
     
+    # should return the number of lines actually deleted
+    def test_delete_section_deleted_lines(self):
+        file_api = FileApi()
+        self.assertEqual(file_api.delete_section(self.file_id, 3, 5), 3)
+        lines = len(file_api.get_source_code_splitted(self.file_id))
+        self.assertEqual(file_api.delete_section(self.file_id, lines - 1, lines + 10), 2)
+        self.assertEqual(file_api.delete_section(self.file_id, 100, 120), 0)
+    
+    # should keep the source hash up to date
+    def test_source_hash(self):
+        file_api = FileApi()
+        file_api.delete_section(self.file_id, 3, 5)
+        file = file_api.get(self.file_id)
+        self.assertEqual(file.source_hash, hashlib.sha256(file.source_code.encode("utf-8")).hexdigest())
+    
     def test_delete_section_exceeded(self):
         file_api = FileApi()
         file_api.delete_section(self.file_id, 45, 70)
@@ -108,7 +125,7 @@ class FileTest(TestCase):
         file_path = str(Path(BASE_DIR, "compiler", "fixtures", "file.json"))
         f = open(file_path)
         data = json.load(f)
-        return data[0]["fields"]["source_code"]
+        return base64.b64decode(data[0]["fields"]["data"]).decode("utf-8")
 
     def __get_test_user(self):
         return User.objects.get(pk=1)
@@ -1,6 +1,9 @@
+from unittest import mock
 from django.test import TestCase
+from django.core.cache import cache
 from compiler.api.section import SectionApi
 from compiler.api.file import FileApi
+from compiler.api.parser import Parser
 
 class SectionTest(TestCase):
     fixtures = ["user.json", "folder.json", "file.json", "file_timer.json",
@@ -32,6 +35,14 @@ class SectionTest(TestCase):
         sections = section_api.get()
         self.assertEqual(len(sections), 8)
     
+    # the text of a section is read from its file, not stored with it
+    def test_get_section_lines(self):
+        section_api = SectionApi(self.file_id)
+        section = section_api.get().get(start_line=5, end_line=10)
+        source_code = FileApi().get_source_code_splitted(self.file_id)
+        self.assertEqual(section_api.get_section_lines(section), source_code[4:10])
+        self.assertEqual(section_api.get_section_lines(section)[0], "line 5")
+
     def test_create_inner(self):
         data = {
             "start_line": 36,
@@ -104,6 +115,55 @@ class SectionTest(TestCase):
         section_api = SectionApi(self.file_id)
         self.assertRaisesMessage(ValueError, "Section conflict detected", section_api.create, data)
     
+    def test_bulk_create(self):
+        data = [
+            {"start_line": 12, "end_line": 22, "section_name": "procedure"},
+            {"start_line": 13, "end_line": 15, "section_name": "variable"},
+            {"start_line": 51, "end_line": 54, "section_name": "procedure"}
+        ]
+        section_api = SectionApi(self.file_id)
+        section_api.bulk_create(data)
+        sections = section_api.get()
+        self.assertEqual(len(sections), 10)
+        self.assertEqual(sections.get(start_line=13).section_type.name, "variable")
+
+    # should not create anything if one of the sections conflicts
+    def test_bulk_create_fail_with_conflict(self):
+        data = [
+            {"start_line": 12, "end_line": 22, "section_name": "procedure"},
+            {"start_line": 2, "end_line": 8, "section_name": "comment"}
+        ]
+        section_api = SectionApi(self.file_id)
+        self.assertRaisesMessage(ValueError, "Section conflict detected", section_api.bulk_create, data)
+        self.assertEqual(len(section_api.get()), 7)
+
+    # sections of one batch are checked against each other too
+    def test_bulk_create_fail_with_conflict_in_batch(self):
+        data = [
+            {"start_line": 12, "end_line": 22, "section_name": "procedure"},
+            {"start_line": 20, "end_line": 25, "section_name": "comment"}
+        ]
+        section_api = SectionApi(self.file_id)
+        self.assertRaisesMessage(ValueError, "Section conflict detected", section_api.bulk_create, data)
+        self.assertEqual(len(section_api.get()), 7)
+
+    def test_bulk_create_fail_wrong_lines(self):
+        data = [
+            {"start_line": 12, "end_line": 22, "section_name": "procedure"},
+            {"start_line": 90, "end_line": 100, "section_name": "comment"}
+        ]
+        section_api = SectionApi(self.file_id)
+        self.assertRaisesMessage(ValueError, "Start and end line values are wrong!", section_api.bulk_create, data)
+        self.assertEqual(len(section_api.get()), 7)
+
+    # query count must not grow with the number of sections
+    def test_replace_queries(self):
+        data = [{"start_line": line, "end_line": line, "section_name": "comment"} for line in range(1, 51)]
+        section_api = SectionApi(self.file_id)
+        with self.assertNumQueries(8):
+            section_api.replace(data)
+        self.assertEqual(len(section_api.get()), 50)
+
     # should delete section
     def test_delete_section(self):
         section_api = SectionApi(self.file_id)
@@ -118,6 +178,89 @@ class SectionTest(TestCase):
         sections = section_api.get()
         self.assertEqual(len(sections), 7)
     
+    # should not touch sections parsed from the same source before
+    def test_parse(self):
+        cache.clear()
+        section_api = SectionApi(self.file_id)
+        self.assertTrue(section_api.parse())
+        sections = list(section_api.get().values_list("id", flat=True))
+
+        section_api = SectionApi(self.file_id)
+        with self.assertNumQueries(0):
+            self.assertFalse(section_api.parse())
+        self.assertEqual(list(section_api.get().values_list("id", flat=True)), sections)
+
+    # sections edited by hand are parsed again
+    def test_parse_after_create(self):
+        cache.clear()
+        section_api = SectionApi(self.file_id)
+        section_api.parse()
+        section_api.create({"start_line": 2, "end_line": 3, "section_name": "comment"})
+        self.assertTrue(SectionApi(self.file_id).parse())
+
+    # files with the same source share one parse
+    def test_parse_shared(self):
+        cache.clear()
+        timer_id = 2
+        SectionApi(timer_id).parse()
+        file = FileApi().get(timer_id)
+        file.pk = None
+        file.parsed_hash = ""
+        file.save()
+
+        with mock.patch("compiler.api.parser.Parser.parse_source_code") as parse_source_code:
+            self.assertTrue(SectionApi(file.id).parse())
+            parse_source_code.assert_not_called()
+        self.assertEqual(len(SectionApi(file.id).get()), len(SectionApi(timer_id).get()))
+
+    def test_parse_after_delete(self):
+        cache.clear()
+        timer_id = 2
+        SectionApi(timer_id).parse()
+        deleted = FileApi().delete_section(timer_id, 385, 386)
+        SectionApi(timer_id).reparse_after_delete(385, deleted)
+        self.assertFalse(SectionApi(timer_id).parse())
+
+    # sections after deleting lines are the same as after parsing the whole file
+    def test_reparse_after_delete(self):
+        for start_line, end_line in [(385, 386), (372, 374), (360, 362), (305, 308), (1, 3), (402, 404)]:
+            with self.subTest(start_line=start_line, end_line=end_line):
+                self.__reparse_after_delete(start_line, end_line)
+
+    # only the procedure holding the edit is parsed again, the rest is kept
+    def test_reparse_after_delete_keeps_sections(self):
+        timer_id = 2
+        section_api = SectionApi(timer_id)
+        section_api.replace(Parser(section_api.source_code, 0).parse())
+        above = section_api.get().get(start_line=10)
+        below = section_api.get().get(start_line=379)
+
+        deleted = FileApi().delete_section(timer_id, 372, 373)
+        SectionApi(timer_id).reparse_after_delete(372, deleted)
+
+        self.assertEqual(section_api.get().get(start_line=10).id, above.id)
+        self.assertEqual(section_api.get().get(start_line=377).id, below.id)
+        self.assertEqual(section_api.get().get(start_line=377).end_line, 403)
+
+    def __reparse_after_delete(self, start_line, end_line):
+        timer_id = 2
+        file_api = FileApi()
+        file = file_api.get(timer_id)
+        source_code = file.source_code
+        section_api = SectionApi(timer_id)
+        section_api.replace(Parser(section_api.source_code, 0).parse())
+
+        deleted = file_api.delete_section(timer_id, start_line, end_line)
+        section_api = SectionApi(timer_id)
+        section_api.reparse_after_delete(start_line, deleted)
+        sections = sorted(section_api.get().values_list("section_type__name", "start_line", "end_line"))
+
+        expected = sorted((section["section_name"], section["start_line"], section["end_line"])
+                          for section in Parser(section_api.source_code, 0).parse())
+        self.assertEqual(sections, expected)
+        file.source_code = source_code
+        file.save()
+
     # should update section_status for all lines having it null
     def test_update_status(self):
         section_api = SectionApi(self.file_id)
@@ -188,6 +331,37 @@ class SectionTest(TestCase):
         self.assertEqual(len(filtered_null), 7)
         self.assertEqual(len(filtered_not_null), 0)
     
+    # gives the same result as updating line by line
+    def test_apply_compilation_statuses(self):
+        error_lines = [
+            {"line_id": "33", "line_content": "33: warning 1"},
+            {"line_id": "2", "line_content": "2: warning 2"},
+            {"line_id": "33", "line_content": "33: warning 3"},
+            {"line_id": "41", "line_content": "41: warning 4"},
+            {"line_id": "99", "line_content": "99: warning 5"}
+        ]
+        section_api = SectionApi(self.file_id)
+        section_api.clear_status_data()
+        for line in error_lines:
+            section_api.update_status_data("Compiled with warnings", line)
+        section_api.update_status("Compiled without warnings")
+        expected = list(section_api.get().order_by("id").values_list("section_status__name", "status_data"))
+
+        section_api.clear_status_data()
+        section_api.apply_compilation_statuses("Compiled with warnings", error_lines)
+        result = list(section_api.get().order_by("id").values_list("section_status__name", "status_data"))
+        self.assertEqual(result, expected)
+        self.assertIn(("Compiled with warnings", "33: warning 1,33: warning 3,"), result)
+
+    # query count must not grow with the number of diagnostics
+    def test_apply_compilation_statuses_queries(self):
+        error_lines = [{"line_id": str(line % 50 + 1), "line_content": f"warning {line}"} for line in range(200)]
+        section_api = SectionApi(self.file_id)
+        with self.assertNumQueries(6):
+            section_api.apply_compilation_statuses("Compiled with warnings", error_lines)
+        sections = section_api.get().filter(section_status__name="Compiled with warnings")
+        self.assertEqual(len(sections), 7)
+
     def test_get_source_code_enriched(self):
         file_api = FileApi()
         source_code = file_api.get_source_code_splitted(self.file_id)
@@ -255,6 +429,13 @@ class SectionTest(TestCase):
         ]
         self.assertEqual(source_code_enriched, expected)
     
+    # one query for the sections, whatever the number of lines and sections
+    def test_get_source_code_enriched_queries(self):
+        source_code = FileApi().get_source_code_splitted(self.file_id)
+        section_api = SectionApi(self.file_id)
+        with self.assertNumQueries(1):
+            section_api.get_source_code_enriched(source_code)
+
     def test_str(self):
         section_api = SectionApi(self.file_id)
         sections = section_api.get()
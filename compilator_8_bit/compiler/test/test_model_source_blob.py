@@ -0,0 +1,164 @@
+import threading
+from datetime import timedelta
+from django.db import connection, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth.models import User
+from compiler.api.file import FileApi
+from compiler.models import File, Folder, SourceBlob
+
+TEMPLATE = "int main(void) {\n    return 0;\n}\n" * 20
+THREADS = 8
+EDITS = 25
+
+
+class SourceBlobTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json"]
+
+    def __create(self, source_code=TEMPLATE, folder_id=1):
+        return FileApi().create({
+            "folder_id": folder_id,
+            "name": "lab.c",
+            "user": User.objects.get(pk=1),
+            "source_code": source_code
+        })
+
+    def __get_ref_count(self, source_code):
+        blob = SourceBlob.objects.filter(pk=SourceBlob.get_hash(source_code)).first()
+        return blob.ref_count if blob else 0
+
+    # the same upload is stored once
+    def test_shared(self):
+        first, second = self.__create(), self.__create()
+        self.assertEqual(File.objects.get(pk=first).blob_id, File.objects.get(pk=second).blob_id)
+        self.assertEqual(SourceBlob.objects.filter(pk=SourceBlob.get_hash(TEMPLATE)).count(), 1)
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 2)
+        self.assertEqual(File.objects.get(pk=second).source_code, TEMPLATE)
+
+    def test_compressed(self):
+        blob = File.objects.get(pk=self.__create()).blob
+        self.assertTrue(blob.compressed)
+        self.assertLess(len(blob.data), blob.size)
+        self.assertEqual(blob.size, len(TEMPLATE.encode("utf-8")))
+        self.assertEqual(blob.get_source_code(), TEMPLATE)
+
+    @override_settings(SOURCE_BLOB_COMPRESS_LEVEL=0)
+    def test_not_compressed(self):
+        blob = File.objects.get(pk=self.__create()).blob
+        self.assertFalse(blob.compressed)
+        self.assertEqual(bytes(blob.data), TEMPLATE.encode("utf-8"))
+
+    # text that does not get smaller is kept as it is
+    def test_not_compressed_short(self):
+        blob = File.objects.get(pk=self.__create("a")).blob
+        self.assertFalse(blob.compressed)
+        self.assertEqual(blob.get_source_code(), "a")
+
+    # the old text goes with its last file
+    def test_edit(self):
+        first, second = self.__create(), self.__create()
+        FileApi().delete_section(first, 1, 3)
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 1)
+        FileApi().delete_section(second, 1, 3)
+        self.assertFalse(SourceBlob.objects.filter(pk=SourceBlob.get_hash(TEMPLATE)).exists())
+        self.assertEqual(self.__get_ref_count(TEMPLATE[TEMPLATE.index("}\n") + 2:]), 2)
+
+    # the row is saved from an instance read before another edit
+    def test_edit_stale(self):
+        file_id = self.__create()
+        file = File.objects.get(pk=file_id)
+        FileApi().delete_section(file_id, 1, 3)
+        file.source_code = TEMPLATE
+        file.save()
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 1)
+        self.assertEqual(SourceBlob.objects.filter(ref_count__gt=0).count(), SourceBlob.objects.count())
+
+    def test_copy(self):
+        file = File.objects.get(pk=self.__create())
+        file.pk = None
+        file.save()
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 2)
+
+    # other fields are saved without reading or counting the blob
+    def test_save_other_fields(self):
+        file = File.objects.get(pk=self.__create())
+        file.name = "renamed.c"
+        with self.assertNumQueries(1):
+            file.save()
+
+    # a soft deleted file keeps its text until it is purged
+    def test_delete_and_purge(self):
+        first, second = self.__create(), self.__create()
+        FileApi().delete(first)
+        FileApi().delete(second)
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 2)
+        self.assertEqual(File.objects.get(pk=first).source_code, TEMPLATE)
+
+        self.assertEqual(FileApi().purge(30), 0)
+        File.objects.filter(pk=first).update(enable_update_date=timezone.now() - timedelta(days=31))
+        self.assertEqual(FileApi().purge(30), 1)
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 1)
+        File.objects.filter(pk=second).update(enable_update_date=timezone.now() - timedelta(days=31))
+        self.assertEqual(FileApi().purge(30), 1)
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 0)
+
+    # files removed with their folder release their blobs too
+    def test_delete_folder(self):
+        self.__create(folder_id=2)
+        self.__create(folder_id=2)
+        Folder.objects.filter(pk=2).delete()
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 0)
+
+    def test_create_without_source(self):
+        file = File.objects.create(name="empty.c", folder_id=1, user_id=1)
+        self.assertEqual(File.objects.get(pk=file.id).source_code, "")
+        self.assertEqual(self.__get_ref_count(""), 1)
+
+    # the text read before is dropped with the blob it came from
+    def test_refresh_from_db(self):
+        file = File.objects.get(pk=self.__create())
+        self.assertEqual(file.source_code, TEMPLATE)
+        FileApi().delete_section(file.id, 1, 3)
+        file.refresh_from_db()
+        self.assertEqual(file.source_code, TEMPLATE[TEMPLATE.index("}\n") + 2:])
+        file.name = "renamed.c"
+        file.save()
+        self.assertEqual(self.__get_ref_count(TEMPLATE), 0)
+
+    def test_counts_match_rows(self):
+        self.__create()
+        self.__create("a")
+        self.__create("a")
+        FileApi().delete_section(File.objects.latest("id").id, 1, 1)
+        for blob in SourceBlob.objects.all():
+            self.assertEqual(blob.ref_count, File.objects.filter(blob=blob).count())
+
+
+# files edited from threads on the database file, each with its own connection
+class SourceBlobThreadTest(TransactionTestCase):
+    fixtures = ["user.json", "folder.json"]
+
+    def test_edit_threads(self):
+        files = [File.objects.create(name="lab.c", folder_id=1, user_id=1, source_code=TEMPLATE) for _ in range(THREADS)]
+        errors = []
+
+        def edit(file_id):
+            try:
+                for edit in range(EDITS):
+                    file = File.objects.get(pk=file_id)
+                    file.source_code = TEMPLATE + str(edit % 3)
+                    file.save()
+            except OperationalError as error:
+                errors.append(str(error))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=edit, args=(file.id,)) for file in files]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual([file.source_code for file in File.objects.all()], [TEMPLATE + str((EDITS - 1) % 3)] * THREADS)
+        for blob in SourceBlob.objects.all():
+            self.assertEqual(blob.ref_count, File.objects.filter(blob=blob).count())
@@ -0,0 +1,77 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from compiler.benchmark.parse_benchmark import SyntheticCorpus, ParseBenchmark, STAGES
+from compiler.api.parser import Parser
+from compiler.models import File, Section
+
+
+class ParseBenchmarkTest(TestCase):
+    fixtures = ["section_type.json"]
+
+    # the corpus is the same for a seed and holds every kind of section
+    def test_corpus(self):
+        source_code = SyntheticCorpus(1).generate(500)
+        self.assertEqual(source_code, SyntheticCorpus(1).generate(500))
+        self.assertGreaterEqual(len(source_code), 500)
+
+        names = set(section["section_name"] for section in Parser(source_code, 0).parse_source_code())
+        self.assertEqual(names, {"directive", "variable", "procedure", "comment", "assembly"})
+
+    def test_corpus_asm(self):
+        corpus = SyntheticCorpus()
+        source_code = corpus.generate(100)
+        asm = corpus.get_asm(source_code)
+        line = next(line for line in asm if line.startswith(";\tsource.c: "))
+        number = int(line.split(":")[1])
+        self.assertIn(source_code[number - 1].strip(), line)
+
+    # every stage is measured and nothing is left in the database
+    def test_run(self):
+        results = ParseBenchmark(300).run()
+        self.assertEqual(list(results), STAGES)
+        self.assertEqual(results["parse"]["queries"], 0)
+        self.assertGreater(results["store"]["queries"], 0)
+        self.assertEqual(results["enrich"]["queries"], 1)
+        self.assertGreater(results["asm"]["lines"], results["parse"]["lines"])
+        for result in results.values():
+            self.assertGreater(result["lines_per_second"], 0)
+            self.assertGreater(result["peak_memory"], 0)
+        self.assertFalse(File.objects.filter(name="parse_benchmark.c").exists())
+        self.assertFalse(Section.objects.exists())
+
+    def test_compare(self):
+        baseline = {"parse": {"lines_per_second": 100}, "store": {"lines_per_second": 100}}
+        results = {"parse": {"lines_per_second": 70}, "store": {"lines_per_second": 90},
+                   "asm": {"lines_per_second": 1}}
+        self.assertEqual(ParseBenchmark.compare(results, baseline, 0.2), [("parse", 0.7)])
+
+
+# the command opens a database of its own, which a TestCase transaction
+# would not let it do
+class BenchmarkParserCommandTest(TransactionTestCase):
+
+    # nothing is written to the configured database, which is used again after
+    def test_command(self):
+        name = connection.settings_dict["NAME"]
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory, "baseline.json")
+            call_command("benchmark_parser", "--lines", "200", "--output", str(output), stdout=io.StringIO())
+            baseline = json.loads(output.read_text())
+            self.assertEqual(list(baseline["200"]), STAGES)
+            self.assertEqual(connection.settings_dict["NAME"], name)
+            self.assertFalse(User.objects.filter(username="parse_benchmark").exists())
+
+            for stage in STAGES:
+                baseline["200"][stage]["lines_per_second"] *= 1000
+            output.write_text(json.dumps(baseline))
+            self.assertRaisesMessage(CommandError, "Slower than the baseline", call_command,
+                                     "benchmark_parser", "--lines", "200", "--baseline", str(output),
+                                     stdout=io.StringIO())
+            self.assertEqual(connection.settings_dict["NAME"], name)
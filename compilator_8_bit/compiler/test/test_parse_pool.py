@@ -0,0 +1,96 @@
+import io
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from compiler.api.parse_pool import ParsePool
+from compiler.api.parser import Parser, ParseCache
+from compiler.models import File, Section
+
+
+class ParsePoolTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json", "file_timer.json", "section_type.json"]
+
+    def setUp(self):
+        cache.clear()
+
+    def __get_sections(self, file_id):
+        return list(Section.objects.filter(file_id=file_id).order_by("start_line")
+                    .values_list("section_type__name", "start_line", "end_line"))
+
+    def __get_expected(self, file_id):
+        source_code = File.objects.get(pk=file_id).source_code.split("\n")
+        return [(data["section_name"], data["start_line"], data["end_line"])
+                for data in Parser(source_code, 0).parse_source_code()]
+
+    def test_parse(self):
+        parse_pool = ParsePool(1, 1)
+        result = parse_pool.parse(parse_pool.get_files())
+        self.assertEqual(result, {"parsed": 2, "skipped": 0, "failed": []})
+        for file in File.objects.all():
+            self.assertEqual(self.__get_sections(file.id), self.__get_expected(file.id))
+            self.assertEqual(file.parsed_hash, ParseCache.get_parse_key(file.source_hash))
+
+        result = parse_pool.parse(parse_pool.get_files())
+        self.assertEqual(result, {"parsed": 0, "skipped": 2, "failed": []})
+
+    def test_parse_processes(self):
+        parse_pool = ParsePool(2, 10)
+        result = parse_pool.parse(parse_pool.get_files(), force=True)
+        self.assertEqual(result["parsed"], 2)
+        for file in File.objects.all():
+            self.assertEqual(self.__get_sections(file.id), self.__get_expected(file.id))
+
+    # a batch costs the same queries whatever the number of files in it
+    def test_parse_batch_queries(self):
+        for copy in range(5):
+            file = File.objects.get(pk=2)
+            file.pk = None
+            file.parsed_hash = ""
+            file.save()
+        parse_pool = ParsePool(1, 10)
+        with self.assertNumQueries(9):
+            parse_pool.parse(parse_pool.get_files())
+
+    def test_get_files_folder(self):
+        parse_pool = ParsePool(1, 1)
+        self.assertEqual([file.id for file in parse_pool.get_files(1)], [1, 2])
+        self.assertEqual([file.id for file in parse_pool.get_files(3)], [1])
+        self.assertEqual([file.id for file in parse_pool.get_files(2)], [])
+
+    # a file that does not parse keeps its sections, the others are written
+    def test_parse_failed(self):
+        file = File.objects.get(pk=1)
+        file.source_code = "int main(void) {\n    return 0;\n"
+        file.save()
+        sections = self.__get_sections(1)
+
+        parse_pool = ParsePool(1, 10)
+        result = parse_pool.parse(parse_pool.get_files())
+        self.assertEqual(result["parsed"], 1)
+        self.assertEqual(result["failed"], [(1, "Unbalanced brackets in section starting at line 1")])
+        self.assertEqual(self.__get_sections(1), sections)
+        self.assertEqual(File.objects.get(pk=1).parsed_hash, "")
+
+    # an unexpected error in the parser fails its file, not the whole run
+    def test_parse_error_unexpected(self):
+        file = File.objects.get(pk=1)
+        file.source_code = "int main(void) {\n    return 0;\n}\n"
+        file.save()
+        parse_source_code = Parser.parse_source_code
+
+        def parse(parser):
+            if len(parser.lines) == 4:
+                raise IndexError("list index out of range")
+            return parse_source_code(parser)
+
+        parse_pool = ParsePool(1, 10)
+        with mock.patch.object(Parser, "parse_source_code", parse):
+            result = parse_pool.parse(parse_pool.get_files())
+        self.assertEqual(result["parsed"], 1)
+        self.assertEqual(result["failed"], [(1, "IndexError: list index out of range")])
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command("parse_files", "--workers", "1", "--progress", stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "2/2 files\nParsed 2 file(s), 0 up to date, 0 failed\n")
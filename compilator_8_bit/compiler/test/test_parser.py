@@ -0,0 +1,140 @@
+import io
+from django.test import SimpleTestCase
+from compiler.api.parser import Parser, ParseError, classify_line
+
+SOURCE_CODE = """#include <stdint.h>
+#define LED 5
+// blinks the led
+// forever
+uint8_t counter = 0;
+int delay;
+/* block
+   comment */
+#ifdef DEBUG
+#define TRACE 1
+#endif
+void wait(int n) {
+    int i;
+    // busy loop
+    for (i = 0; i < n; i++) {
+    }
+}
+/* one line */
+int main(void)
+{
+    __asm
+    nop
+    __endasm;
+    return 0;
+}
+"""
+
+class ParserTest(SimpleTestCase):
+
+    def test_classify_line(self):
+        lines = {
+            "#ifdef DEBUG": "ifdefine",
+            "#if !defined(DEBUG)": "ifdefine",
+            "#endif": "enddefine",
+            "  #include <stdint.h>  ": "directive",
+            "// comment": "line_comment",
+            "/* comment */": "block_line_comment",
+            "/* comment": "block_comment",
+            "comment */": "end_block_comment",
+            "int main(void) {": "procedure",
+            "unsigned char c = 0;": "variable",
+            "asm {": "asm",
+            "__asm__ volatile (\"nop\");": "asm_round",
+            "__asm": "asm_floor_start",
+            "__endasm;": "asm_floor_end",
+            "return 0;": None,
+            "": None
+        }
+        for line, key in lines.items():
+            self.assertEqual(classify_line(line), key, line)
+
+    # a line matching several patterns gets the key of the first one
+    def test_classify_line_order(self):
+        self.assertEqual(classify_line("/* comment */"), "block_line_comment")
+        self.assertEqual(classify_line("int x; /* comment */"), "end_block_comment")
+        self.assertEqual(classify_line("int f(int x);"), "procedure")
+
+    def test_parse_source_code(self):
+        parser = Parser(SOURCE_CODE.split("\n"), 0)
+        data = parser.parse_source_code()
+        self.assertEqual(data, [
+            {"section_name": "directive", "start_line": 1, "end_line": 2, "parent_start_line": None},
+            {"section_name": "comment", "start_line": 3, "end_line": 4, "parent_start_line": None},
+            {"section_name": "variable", "start_line": 5, "end_line": 6, "parent_start_line": None},
+            {"section_name": "comment", "start_line": 7, "end_line": 8, "parent_start_line": None},
+            {"section_name": "directive", "start_line": 9, "end_line": 11, "parent_start_line": None},
+            {"section_name": "procedure", "start_line": 12, "end_line": 17, "parent_start_line": None},
+            {"section_name": "variable", "start_line": 13, "end_line": 13, "parent_start_line": 12},
+            {"section_name": "comment", "start_line": 14, "end_line": 14, "parent_start_line": 12},
+            {"section_name": "comment", "start_line": 18, "end_line": 18, "parent_start_line": None},
+            {"section_name": "procedure", "start_line": 19, "end_line": 25, "parent_start_line": None},
+            {"section_name": "assembly", "start_line": 21, "end_line": 23, "parent_start_line": 19}
+        ])
+
+    def test_get_tree(self):
+        parser = Parser("int f(void) {\n    int g(void) {\n        int x;\n    }\n}\n".split("\n"), 0)
+        parser.parse_source_code()
+        variable = {"section_name": "variable", "start_line": 3, "end_line": 3,
+                    "parent_start_line": 2, "children": []}
+        inner = {"section_name": "procedure", "start_line": 2, "end_line": 4,
+                 "parent_start_line": 1, "children": [variable]}
+        self.assertEqual(parser.get_tree(), [
+            {"section_name": "procedure", "start_line": 1, "end_line": 5,
+             "parent_start_line": None, "children": [inner]}
+        ])
+
+    def test_parse_source_code_unbalanced(self):
+        parser = Parser("int main(void) {\n    return 0;\n".split("\n"), 0)
+        self.assertRaisesMessage(ParseError, "Unbalanced brackets in section starting at line 1",
+                                 parser.parse_source_code)
+
+    # sections come out as soon as they close, inner ones before their procedure
+    def test_parse(self):
+        read = []
+        lines = (read.append(line) or line for line in io.StringIO(SOURCE_CODE))
+        sections = Parser(lines, 0).parse()
+        self.assertEqual(next(sections), {"section_name": "directive", "start_line": 1,
+                                          "end_line": 2, "parent_start_line": None})
+        self.assertEqual(len(read), 3)
+
+        names = [(section["section_name"], section["start_line"]) for section in sections]
+        self.assertEqual(names[4:7], [("variable", 13), ("comment", 14), ("procedure", 12)])
+
+    # without a trailing newline the last section ends with the last line
+    def test_parse_last_line(self):
+        sections = list(Parser(io.StringIO("int x;\nint y;"), 0).parse())
+        self.assertEqual(sections, [{"section_name": "variable", "start_line": 1,
+                                     "end_line": 2, "parent_start_line": None}])
+
+    def test_parse_not_closed(self):
+        sections = Parser(io.StringIO("int x;\n/* comment\n"), 0).parse()
+        self.assertRaisesMessage(ParseError, "Section starting at line 2 is not closed", list, sections)
+
+    # brackets in strings, char literals and comments do not end procedures
+    def test_parse_brackets_not_code(self):
+        source_code = """void f(void) {
+    puts("}");
+    c = '}';
+    /* }
+       } */
+    // }
+}
+int x;
+"""
+        data = Parser(source_code.split("\n"), 0).parse_source_code()
+        self.assertEqual([(section["section_name"], section["start_line"], section["end_line"]) for section in data], [
+            ("procedure", 1, 7), ("comment", 4, 5), ("comment", 6, 6), ("variable", 8, 8)
+        ])
+
+    # a comment ends on its "*/", wherever it is on the line
+    def test_parse_block_comment(self):
+        source_code = "/* comment\n*/ int x;\nint y;\n"
+        data = Parser(source_code.split("\n"), 0).parse_source_code()
+        self.assertEqual([(section["section_name"], section["start_line"], section["end_line"]) for section in data], [
+            ("comment", 1, 2), ("variable", 3, 3)
+        ])
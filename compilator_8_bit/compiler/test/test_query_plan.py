@@ -0,0 +1,73 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from compiler.api.file import FileApi
+from compiler.api.parse_pool import ParsePool
+from compiler.api.parser import Parser
+from compiler.api.section import SectionApi
+
+
+# the queries the apis actually run, planned by SQLite
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+class QueryPlanTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json", "file_timer.json",
+                "section_type.json", "section_status.json", "section.json"]
+
+    def __get_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return " / ".join(row[-1] for row in cursor.fetchall())
+
+    def __get_queries(self, call, table):
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        return [query["sql"] for query in queries.captured_queries if table in query["sql"]]
+
+    def __get_query(self, call, table, text):
+        return next(sql for sql in self.__get_queries(call, table) if text in sql)
+
+    # the sections of the file are read and reset from the index, the
+    # sections holding a diagnostic are then updated by id
+    def test_apply_compilation_statuses(self):
+        queries = self.__get_queries(
+            lambda: SectionApi(1).apply_compilation_statuses(
+                "Compiled with warnings", [{"line_id": "6", "line_content": "6: warning"}]),
+            "\"compiler_section\"")
+        select, reset, update = queries
+        self.assertIn("USING COVERING INDEX section_file_lines_idx (file_id=?)", self.__get_plan(select))
+        self.assertIn("INDEX section_file_lines_idx (file_id=?)", self.__get_plan(reset))
+        self.assertIn("USING INTEGER PRIMARY KEY (rowid=?)", self.__get_plan(update))
+
+    # the blocks come sorted from the index, the region deleted and the
+    # sections shifted below it are found by seeking on the first line
+    def test_reparse_after_delete(self):
+        timer_id = 2
+        section_api = SectionApi(timer_id)
+        section_api.replace(Parser(section_api.source_code, 0).parse())
+        deleted = FileApi().delete_section(timer_id, 372, 373)
+        queries = self.__get_queries(lambda: SectionApi(timer_id).reparse_after_delete(372, deleted),
+                                     "\"compiler_section\"")
+        blocks = next(sql for sql in queries if "ORDER BY" in sql)
+        delete = next(sql for sql in queries if sql.startswith("DELETE"))
+        shift = next(sql for sql in queries if sql.startswith("UPDATE"))
+
+        self.assertIn("USING COVERING INDEX section_file_lines_idx (file_id=?)", self.__get_plan(blocks))
+        self.assertNotIn("TEMP B-TREE", self.__get_plan(blocks))
+        self.assertIn("USING COVERING INDEX section_file_lines_idx (file_id=? AND start_line>? AND start_line<?)",
+                      self.__get_plan(delete))
+        self.assertIn("INDEX section_file_lines_idx (file_id=? AND start_line>?)", self.__get_plan(shift))
+
+    # the overlap check does not read the table at all
+    def test_validate_range(self):
+        section_api = SectionApi(1)
+        sql = self.__get_query(
+            lambda: section_api.create({"start_line": 12, "end_line": 22, "section_name": "procedure"}),
+            "\"compiler_section\"", "LIMIT 1")
+        self.assertIn("USING COVERING INDEX section_file_lines_idx", self.__get_plan(sql))
+
+    # Django writes enabled=True as a bare column, which SQLite checks on the
+    # index entry instead of seeking on it
+    def test_get_files(self):
+        sql = self.__get_query(lambda: list(ParsePool(1, 1).get_files(1)), "FROM \"compiler_file\"", "IN (")
+        self.assertIn("USING INDEX file_folder_enabled_idx (folder_id=?)", self.__get_plan(sql))
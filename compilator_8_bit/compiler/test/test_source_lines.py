@@ -0,0 +1,68 @@
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from compiler.api.file import FileApi
+from compiler.api.source_lines import SourceLines
+from compiler.models import File
+
+SOURCE_CODES = ["", "a", "a\n", "\n\n", "int x;\nint y;\n\n// z\n}"]
+
+
+class SourceLinesTest(SimpleTestCase):
+
+    def __get_lines(self, source_code):
+        return SourceLines(File(source_code=source_code, line_offsets=File.get_line_offsets(source_code)))
+
+    def test_get(self):
+        for source_code in SOURCE_CODES:
+            lines = self.__get_lines(source_code)
+            splitted = source_code.split("\n")
+            self.assertEqual(lines.count(), len(splitted))
+            for start in range(1, len(splitted) + 1):
+                for end in range(start, len(splitted) + 2):
+                    self.assertEqual(lines.get(start, end), splitted[start - 1 : end], (source_code, start, end))
+                self.assertEqual(list(lines.iter_from(start)), splitted[start - 1:])
+
+    # offsets missing in rows saved before they were kept are computed
+    def test_get_no_offsets(self):
+        lines = SourceLines(File(source_code="a\nb"))
+        self.assertEqual(lines.get(2, 2), ["b"])
+
+    # same text as deleting from the split lines, for every range
+    def test_delete(self):
+        for source_code in SOURCE_CODES:
+            splitted = source_code.split("\n")
+            for start in range(1, len(splitted) + 1):
+                for end in range(start, len(splitted) + 2):
+                    expected = splitted[:]
+                    del expected[start - 1 : end]
+                    new_source_code, line_offsets, deleted = self.__get_lines(source_code).delete(start, end)
+                    self.assertEqual(new_source_code, "\n".join(expected), (source_code, start, end))
+                    self.assertEqual(line_offsets, File.get_line_offsets(new_source_code))
+                    self.assertEqual(deleted, len(splitted) - len(expected))
+
+
+class FileLineOffsetsTest(TestCase):
+    fixtures = ["user.json", "folder.json", "file.json"]
+
+    def test_save(self):
+        file = File.objects.get(pk=1)
+        file.source_code = "a\nbc"
+        file.save()
+        file = File.objects.get(pk=1)
+        self.assertEqual(SourceLines(file).get(1, 2), ["a", "bc"])
+
+    # offsets spliced by the delete are not computed again from the text
+    def test_delete_section(self):
+        file = File.objects.get(pk=1)
+        source_code = file.source_code
+        file.line_offsets = File.get_line_offsets(source_code)
+        file.save()
+        with mock.patch.object(File, "get_line_offsets", wraps=File.get_line_offsets) as get_line_offsets:
+            FileApi().delete_section(1, 2, 3)
+            get_line_offsets.assert_not_called()
+
+        file = File.objects.get(pk=1)
+        expected = source_code.split("\n")
+        del expected[1:3]
+        self.assertEqual(file.source_code, "\n".join(expected))
+        self.assertEqual(bytes(file.line_offsets), File.get_line_offsets(file.source_code))
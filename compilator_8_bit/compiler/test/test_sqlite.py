@@ -0,0 +1,42 @@
+import os
+import sqlite3
+import tempfile
+from unittest import skipUnless
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+from compiler.sqlite import set_pragmas
+
+
+@skipUnless(connection.vendor == "sqlite", "pragmas are set on SQLite only")
+class SqliteTest(SimpleTestCase):
+
+    def __get_pragmas(self, cursor):
+        pragmas = {}
+        for name in ["journal_mode", "synchronous", "busy_timeout", "cache_size"]:
+            cursor.execute(f"PRAGMA {name}")
+            pragmas[name] = cursor.fetchone()[0]
+        return pragmas
+
+    # every new connection of a database file is tuned
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": "wal", "synchronous": "normal",
+                                       "busy_timeout": 1500, "cache_size": -2048})
+    def test_connection_created(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({**connection.settings_dict, "NAME": os.path.join(directory, "db.sqlite3")})
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = self.__get_pragmas(cursor)
+            finally:
+                wrapper.close()
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 1500, "cache_size": -2048})
+
+    def test_set_pragmas(self):
+        db = sqlite3.connect(":memory:")
+        try:
+            set_pragmas(db.cursor(), {"synchronous": "off", "busy_timeout": 10})
+            pragmas = self.__get_pragmas(db.cursor())
+        finally:
+            db.close()
+        self.assertEqual(pragmas["synchronous"], 0)
+        self.assertEqual(pragmas["busy_timeout"], 10)
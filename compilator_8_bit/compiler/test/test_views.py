@@ -1,11 +1,15 @@
-import subprocess
-from pathlib import Path
-from django.test import TestCase
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from compilator_8_bit.settings import BASE_DIR
 from compiler.views import get_source_file, get_dependent_options, dependent_options
+from compiler.api.compile_queue import CompileQueue
+from compiler.api.file import FileApi
+from compiler.api.section import SectionApi
+from compiler.api.compile_cache import CompileCache
+from compiler.api.compile_result import CompileResult
 
 STATUS_CODE_OK = 200
 STATUS_CODE_REDIRECT = 302
@@ -16,6 +20,21 @@ f_id = 1
 def get_test_user():
     return User.objects.get(pk=1)
 
+# compilations of the class run and keep their results in directories of
+# its own, never in the BASE_DIR/asm and BASE_DIR/asm_cache the site uses
+class CompileDirMixin:
+
+    @classmethod
+    def setUpClass(cls):
+        sandbox = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(sandbox.cleanup)
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        settings = override_settings(COMPILE_CACHE_DIR=directory.name, COMPILE_SANDBOX_DIR=sandbox.name)
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        super().setUpClass()
+
 class ErrorViewTest(TestCase):
     fixtures = ["user.json"]
 
@@ -103,6 +122,17 @@ class ParseFileViewTest(TestCase):
         self.assertEqual(response.status_code, STATUS_CODE_OK)
         self.assertContains(response, f'<input type="hidden" id="selected_file" value="2">')
     
+    def test_parse_file_unbalanced(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        file = FileApi().get(f_id)
+        file.source_code = "int main(void) {\n    return 0;\n"
+        file.save()
+        url = reverse("parse-file", args=(f_id,))
+        response = self.client.get(url)
+        self.assertContains(response, "Unbalanced brackets in section starting at line 1",
+                            status_code=STATUS_CODE_ERROR)
+    
     def test_parse_file_not_exist(self):
         user = get_test_user()
         self.client.force_login(user)
@@ -370,8 +400,20 @@ class DeleteSectionViewTest(TestCase):
         self.client.force_login(user)
         url = reverse("delete-section", args=(f_id, 5, 8))
         response = self.client.post(url)
-        self.assertEqual(response.status_code, STATUS_CODE_REDIRECT)
-        self.assertEqual(response.url, f"/file/{f_id}/parse")
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        self.assertContains(response, "line 9")
+        self.assertNotContains(response, "line 8<")
+
+    # the text keeps its lines when the sections cannot be moved
+    def test_delete_section_post_reparse_failed(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        source_code = FileApi().get_source_code(f_id)
+        url = reverse("delete-section", args=(f_id, 5, 8))
+        with mock.patch.object(SectionApi, "reparse_after_delete", side_effect=ValueError):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, STATUS_CODE_ERROR)
+        self.assertEqual(FileApi().get_source_code(f_id), source_code)
 
     def test_delete_section_post_file_not_exist(self):
         user = get_test_user()
@@ -380,7 +422,7 @@ class DeleteSectionViewTest(TestCase):
         response = self.client.post(url)
         self.assertEqual(response.status_code, STATUS_CODE_ERROR)
 
-class CompileViewTest(TestCase):
+class CompileViewTest(CompileDirMixin, TestCase):
     fixtures = ["user.json", "folder.json", "file.json", "file_timer.json",
                 "section_type.json", "section_status.json", "section.json"]
     
@@ -407,12 +449,26 @@ class CompileViewTest(TestCase):
             "command_line_standard": "c11",
             "command_line_processor": "stm8"
         })
-        self.assertEqual(response.status_code, STATUS_CODE_REDIRECT)
-        self.assertRegex(response.url, f"^/compile\?id={f_id}&uid=")
-        uid = response.url.replace(f"/compile?id={f_id}&uid=", "")
-        print(uid)
-        # deleting folder
-        self.__delete_asm_content()
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        self.assertContains(response, f'<input type="hidden" id="selected_file" value="{f_id}">')
+
+    def test_compile_post_logged_json(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        url = reverse("compile")
+        response = self.client.post(url, {
+            "file_id": f_id,
+            "command_line_standard": "c11",
+            "command_line_processor": "stm8"
+        }, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        data = response.json()
+        self.assertEqual(data["file_id"], f_id)
+        self.assertIn(data["status"], ["Compiled without warnings", "Compiled with warnings", "Does not compile"])
+
+        # result stays readable by its id
+        response = self.client.get(f"{url}?id={f_id}&uid={data['uid']}")
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
     
     def test_compile_post_logged_timer(self):
         timer_file_id = 2
@@ -424,12 +480,8 @@ class CompileViewTest(TestCase):
             "command_line_standard": "c11",
             "command_line_processor": "stm8"
         })
-        self.assertEqual(response.status_code, STATUS_CODE_REDIRECT)
-        self.assertRegex(response.url, f"^/compile\?id={timer_file_id}&uid=")
-        uid = response.url.replace(f"/compile?id={timer_file_id}&uid=", "")
-        print(uid)
-        # deleting folder
-        self.__delete_asm_content()
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        self.assertContains(response, f'<input type="hidden" id="selected_file" value="{timer_file_id}">')
     
     def test_compile_post_logged_not_exist(self):
         user = get_test_user()
@@ -441,7 +493,6 @@ class CompileViewTest(TestCase):
             "command_line_processor": "stm8"
         })
         self.assertEqual(response.status_code, STATUS_CODE_ERROR)
-        self.__delete_asm_content()
     
     def test_compile_get_not_logged(self):
         url = reverse("compile")
@@ -463,15 +514,127 @@ class CompileViewTest(TestCase):
         response = self.client.get(f"{url}?id={f_id}&uid=123")
         self.assertEqual(response.status_code, STATUS_CODE_ERROR)
 
-    def __delete_asm_content(self):
-        COMPILER_DIR = "asm"
-        directory = str(Path(BASE_DIR, COMPILER_DIR))
-        command = f"cd {directory} && rm -rf *"
-        subprocess.call(command, shell=True)
-    
     def test_get_dependent_options(self):
         self.assertEqual(get_dependent_options("mcs51"), dependent_options["mcs51"])
         self.assertEqual(get_dependent_options("ds390"), dependent_options["ds390"])
         self.assertEqual(get_dependent_options("z80"), dependent_options["z80"])
         self.assertEqual(get_dependent_options("sm83"), dependent_options["sm83"])
         self.assertEqual(get_dependent_options("stm8"), dependent_options["stm8"])
+
+class CompileLineIndexViewTest(TestCase):
+    fixtures = ["user.json"]
+    uid = "e" * 64
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(COMPILE_CACHE_DIR=self.directory.name)
+        self.settings.enable()
+        asm = ";--------------------------------------------------------\n; code\n" \
+              ";--------------------------------------------------------\n;\tsource.c: 1: int x;\n\tnop"
+        CompileCache().put(self.uid, CompileResult(0, b"", asm), "Compiled without warnings", [])
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def test_line_index_not_logged(self):
+        url = reverse("compile-line-index", args=(self.uid,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_REDIRECT)
+
+    # entries cached without an index get one computed
+    def test_line_index_logged(self):
+        self.client.force_login(get_test_user())
+        url = reverse("compile-line-index", args=(self.uid,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        self.assertEqual(response.json(), {
+            "uid": self.uid,
+            "source_to_asm": {"1": [[4, 5]]},
+            "asm_to_source": [0, 0, 0, 1, 1]
+        })
+
+    def test_line_index_not_exist(self):
+        self.client.force_login(get_test_user())
+        url = reverse("compile-line-index", args=("f" * 64,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_ERROR)
+
+class CompileJobsViewTest(CompileDirMixin, TestCase):
+    fixtures = ["user.json", "folder.json", "file.json", "file_timer.json",
+                "section_type.json", "section_status.json", "section.json"]
+
+    def test_compile_jobs_post_not_logged(self):
+        url = reverse("compile-jobs")
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, STATUS_CODE_REDIRECT)
+        self.assertEqual(response.url, f"/login?next=/compile/jobs")
+
+    # should fail if file, processor or standard are not present
+    def test_compile_jobs_post_logged_missing_data(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        url = reverse("compile-jobs")
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, STATUS_CODE_ERROR)
+
+    def test_compile_jobs_post_logged_not_exist(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        url = reverse("compile-jobs")
+        response = self.client.post(url, {
+            "file_id": 100,
+            "command_line_standard": "c11",
+            "command_line_processor": "stm8"
+        })
+        self.assertEqual(response.status_code, STATUS_CODE_ERROR)
+
+    def test_compile_jobs_post_logged(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        url = reverse("compile-jobs")
+        response = self.client.post(url, {
+            "file_id": f_id,
+            "command_line_standard": "c11",
+            "command_line_processor": "stm8"
+        })
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        job_id = response.json()["job_id"]
+
+        url = reverse("compile-job", args=(job_id,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        self.assertEqual(response.json()["status"], "queued")
+        self.assertEqual(response.json()["file_id"], f_id)
+
+    # finished job answers with the rendered result
+    def test_compile_job_get_done(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        url = reverse("compile-jobs")
+        response = self.client.post(url, {
+            "file_id": f_id,
+            "command_line_standard": "c11",
+            "command_line_processor": "stm8"
+        })
+        job_id = response.json()["job_id"]
+        CompileQueue().run_next()
+
+        url = reverse("compile-job", args=(job_id,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_OK)
+        self.assertEqual(response.json()["status"], "done")
+        self.assertIn(f'<input type="hidden" id="selected_file" value="{f_id}">', response.json()["html"])
+
+    def test_compile_job_get_not_logged(self):
+        url = reverse("compile-job", args=(1,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_REDIRECT)
+        self.assertEqual(response.url, f"/login?next=/compile/jobs/1")
+
+    def test_compile_job_get_not_exist(self):
+        user = get_test_user()
+        self.client.force_login(user)
+        url = reverse("compile-job", args=(100,))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, STATUS_CODE_ERROR)
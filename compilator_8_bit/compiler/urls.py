@@ -16,6 +16,9 @@ urlpatterns = [
     path("file/<int:id>/parse", views.parse_file, name="parse-file"),
     path("file/<int:id>", views.view_file, name="file"),
     path("compile", login_required(views.Compile.as_view()), name="compile"),
+    path("compile/<str:uid>/line-index", login_required(views.CompileLineIndex.as_view()), name="compile-line-index"),
+    path("compile/jobs", login_required(views.CompileJobs.as_view()), name="compile-jobs"),
+    path("compile/jobs/<int:id>", login_required(views.CompileJobStatus.as_view()), name="compile-job"),
     path("login", auth_views.LoginView.as_view(template_name="compiler/login.html"), name="login"),
     path("logout", views.logout_view, name="logout")
 ]
\ No newline at end of file
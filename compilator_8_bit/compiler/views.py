@@ -1,16 +1,22 @@
 import re
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, HttpResponseRedirect
+from django.template.loader import render_to_string
 from django.http import JsonResponse
 from django.views import View
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
-from compiler.api.folder_tree import FolderTree
+from django.utils import timezone
+from compiler.api.folder_tree import FolderTreeCache
 from compiler.api.file import FileApi
 from compiler.api.folder import FolderApi
 from compiler.api.compiler import Compiler
-from compiler.api.parser import Parser
+from compiler.api.compile_queue import CompileQueue
+from compiler.api.parser import ParseError
 from compiler.api.section import SectionApi
+from compiler.models import File, CompileJob
 from .forms import FolderForm, FileForm
 
 # Create your views here.
@@ -28,8 +34,8 @@ def get_source_code_enriched(id):
     section_api = SectionApi(id)
     return section_api.get_source_code_enriched(source_code)
 
-def get_folder_structure():
-    folder_tree = FolderTree()
+def get_folder_structure(user_id):
+    folder_tree = FolderTreeCache(user_id)
     return folder_tree.get_folder_structure()
 
 command_line_options = {
@@ -61,7 +67,7 @@ def get_dependent_options(processor):
 @login_required
 def index(request):
     print("User: ", request.user)
-    folder_structure = get_folder_structure()
+    folder_structure = get_folder_structure(request.user.id)
     return render(request, 'compiler/index.html', {
         'folder_structure': folder_structure,
         'command_line_options': command_line_options
@@ -69,7 +75,7 @@ def index(request):
 
 @login_required
 def view_file(request, id):
-    folder_structure = get_folder_structure()
+    folder_structure = get_folder_structure(request.user.id)
     
     try:
         source_code = get_source_code_enriched(id)
@@ -86,25 +92,8 @@ def view_file(request, id):
 @login_required
 def parse_file(request, id):
     try:
-        source_code = get_source_code_splitted(id)
-        parser = Parser(source_code, 0)
-        parsed_data = parser.parse_source_code()
-
-        for section in parsed_data:
-            if section["section_name"] == "procedure":
-                start_line = section["start_line"]
-                end_line = section["end_line"]
-                if start_line != end_line:
-                    lines = source_code[start_line : end_line]
-                    parser = Parser(lines, start_line)
-                    subsection_data = parser.parse_source_code()
-                    if len(subsection_data):
-                        parsed_data.extend(subsection_data)
-
         section_api = SectionApi(id)
-        section_api.delete()
-        for section in parsed_data:
-            section_api.create(section)
+        section_api.parse()
 
         # folder_structure = get_folder_structure()
         source_code = get_source_code_enriched(id)
@@ -121,6 +110,8 @@ def parse_file(request, id):
             'source_code': source_code,
             'file_id': id
         })
+    except ParseError as error:
+        return render(request, 'compiler/error.html', {'message': str(error)}, status=400)
     except:
         # return HttpResponseRedirect(reverse('error-page'))
         return render(request, 'compiler/error.html', status=400)
@@ -310,35 +301,84 @@ class DeleteSection(View):
 
     def post(self, request, id, start_line, end_line):
         try:
-            section_api = SectionApi(id)
-            section_api.delete_section(start_line, end_line)
-
+            # the section itself goes with its lines; the text keeps them
+            # when the sections cannot follow
             file_api = FileApi()
-            file_api.delete_section(id, start_line, end_line)
-            print(start_line)
-            print(end_line)
-            return HttpResponseRedirect(reverse('parse-file', args=(id,)))
+            with transaction.atomic():
+                # a write comes first: on SQLite in WAL mode a transaction
+                # that read before its first write fails at once when another
+                # connection committed in between
+                File.objects.filter(pk=id).update(update_date=timezone.now())
+                deleted = file_api.delete_section(id, start_line, end_line)
+                section_api = SectionApi(id)
+                section_api.reparse_after_delete(start_line, deleted)
+
+            return render(request, 'compiler/main_code.html', {
+                'source_code': get_source_code_enriched(id),
+                'file_id': id
+            })
+        except ParseError as error:
+            return render(request, 'compiler/error.html', {'message': str(error)}, status=400)
         except:
             # return HttpResponseRedirect(reverse('error-page'))
             return render(request, 'compiler/error.html', status=400)
 
+def get_compile_options(request):
+    print(request.POST)
+    file_id = request.POST.get("file_id", None)
+    standard = request.POST.get("command_line_standard", None)
+    optimizations = request.POST.getlist("command_line_optimization")
+    processor = request.POST.get("command_line_processor", None)
+    dependent = request.POST.getlist("command_line_dependent")
+
+    if file_id == None or standard == None or processor == None:
+        return None
+
+    request.session["standard"] = standard
+    request.session["optimizations"] = optimizations
+    request.session["processor"] = processor
+    request.session["dependent"] = dependent
+    request.session["dependent_options"] = get_dependent_options(processor)
+
+    return file_id, standard, processor, optimizations, dependent
+
+def get_compiled(file_id, compiler):
+    result, asm_code = compiler.get_asm()
+
+    # folder_structure = get_folder_structure()
+    source_file = get_source_file(file_id)
+    source_code = get_source_code_enriched(file_id)
+    asm_name = (source_file.name)[:-2] + ".asm"
+
+    if result:
+        return 'compiler/compiled.html', {
+            # 'folder_structure': folder_structure,
+            # 'command_line_options': command_line_options,
+            'source_code': source_code,
+            'file_id': file_id,
+            'asm_code': asm_code,
+            'asm_name': asm_name,
+            'uid': compiler.uid
+        }
+    else:
+        return 'compiler/compilation_error.html', {
+            # 'folder_structure': folder_structure,
+            # 'command_line_options': command_line_options,
+            'source_code': source_code,
+            'file_id': file_id,
+            'error_code': asm_code
+        }
+
+def wants_json(request):
+    return "application/json" in request.headers.get("Accept", "")
+
 class Compile(View):
+    # compiles and answers with the result in the same response
     def post(self, request):
-        print(request.POST)
-        file_id = request.POST.get("file_id", None)
-        standard = request.POST.get("command_line_standard", None)
-        optimizations = request.POST.getlist("command_line_optimization")
-        processor = request.POST.get("command_line_processor", None)
-        dependent = request.POST.getlist("command_line_dependent")
-
-        if file_id == None or standard == None or processor == None:
+        options = get_compile_options(request)
+        if options == None:
             return render(request, 'compiler/error.html', status=400)
-
-        request.session["standard"] = standard
-        request.session["optimizations"] = optimizations
-        request.session["processor"] = processor
-        request.session["dependent"] = dependent
-        request.session["dependent_options"] = get_dependent_options(processor)
+        file_id, standard, processor, optimizations, dependent = options
 
         try:
             compiler = Compiler(file_id, standard, processor, optimizations, dependent)
@@ -347,19 +387,26 @@ class Compile(View):
             print(status)
             print(error_lines)
             section_api = SectionApi(file_id)
-            section_api.clear_status_data()
-
-            for line in error_lines:
-                section_api.update_status_data(status, line)
-            if status == "Compiled with warnings":
-                status = "Compiled without warnings"
-            section_api.update_status(status)
+            section_api.apply_compilation_statuses(status, error_lines)
 
-            return HttpResponseRedirect(reverse('compile') + "?id=" + file_id + "&uid=" + uid)
+            template, context = get_compiled(file_id, compiler)
+            if wants_json(request):
+                asm_code = context.get("asm_code")
+                data = {
+                    "file_id": int(file_id),
+                    "uid": uid,
+                    "status": status,
+                    "asm_code": [line.as_dict() for line in asm_code] if asm_code is not None else None,
+                    "asm_name": context.get("asm_name"),
+                    "error_code": context.get("error_code")
+                }
+                return JsonResponse(data)
+            return render(request, template, context)
         except:
             # return HttpResponseRedirect(reverse('error-page'))
             return render(request, 'compiler/error.html', status=400)
     
+    # renders a result compiled earlier, e.g. by a compile job
     def get(self, request):
         file_id = request.GET.get("id", None)
         uid = request.GET.get("uid", None)
@@ -370,32 +417,69 @@ class Compile(View):
         compiler = Compiler(uid)
 
         try:
-            result, asm_code = compiler.get_and_delete_asm()
-            print(asm_code)
-
-            # folder_structure = get_folder_structure()
-            source_file = get_source_file(file_id)
-            source_code = get_source_code_enriched(file_id)
-            asm_name = (source_file.name)[:-2] + ".asm"
-
-            if result:
-                return render(request, 'compiler/compiled.html', {
-                    # 'folder_structure': folder_structure,
-                    # 'command_line_options': command_line_options,
-                    'source_code': source_code,
-                    'file_id': file_id,
-                    'asm_code': asm_code,
-                    'asm_name': asm_name
-                })
-            else:
-                return render(request, 'compiler/compilation_error.html', {
-                    # 'folder_structure': folder_structure,
-                    # 'command_line_options': command_line_options,
-                    'source_code': source_code,
-                    'file_id': file_id,
-                    'error_code': asm_code
-                })
-        
+            template, context = get_compiled(file_id, compiler)
+            return render(request, template, context)
+        except:
+            # return HttpResponseRedirect(reverse('error-page'))
+            return render(request, 'compiler/error.html', status=400)
+
+class CompileLineIndex(View):
+    # source and asm lines of a compilation result mapped to each other
+    def get(self, request, uid):
+        try:
+            line_index = Compiler(uid).get_line_index()
+            if line_index is None:
+                raise ValueError("No asm code to index!")
+            return JsonResponse({"uid": uid, **line_index})
+        except:
+            # return HttpResponseRedirect(reverse('error-page'))
+            return render(request, 'compiler/error.html', status=400)
+
+class CompileJobs(View):
+    def post(self, request):
+        options = get_compile_options(request)
+        if options == None:
+            return render(request, 'compiler/error.html', status=400)
+        file_id, standard, processor, optimizations, dependent = options
+
+        try:
+            get_source_file(file_id)
+            compile_queue = CompileQueue()
+            job_id = compile_queue.enqueue({
+                "file_id": file_id,
+                "user": request.user,
+                "standard": standard,
+                "processor": processor,
+                "optimizations": optimizations,
+                "dependent": dependent
+            })
+            data = {
+                "job_id": job_id,
+                "status": "queued"
+            }
+            return JsonResponse(data)
+        except:
+            # return HttpResponseRedirect(reverse('error-page'))
+            return render(request, 'compiler/error.html', status=400)
+
+class CompileJobStatus(View):
+    def get(self, request, id):
+        try:
+            wait = min(float(request.GET.get("wait", 0)), settings.COMPILE_QUEUE_MAX_WAIT)
+            compile_queue = CompileQueue()
+            job = compile_queue.wait(id, request.user, wait)
+            data = {
+                "job_id": job.id,
+                "file_id": job.file_id,
+                "status": job.status,
+                "uid": job.uid,
+                "compilation_status": job.compilation_status
+            }
+            # finished job carries the rendered result, no extra request needed
+            if job.status == CompileJob.DONE:
+                template, context = get_compiled(job.file_id, Compiler(job.uid))
+                data["html"] = render_to_string(template, context, request)
+            return JsonResponse(data)
         except:
             # return HttpResponseRedirect(reverse('error-page'))
             return render(request, 'compiler/error.html', status=400)